@@ -1,15 +1,18 @@
 from fastapi import Depends, HTTPException, UploadFile, File, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional, Dict, Any, Union
-from firebase_admin.exceptions import FirebaseError
 
 from ..core.config.config import get_settings
 from ..services.docling_service import get_docling_service
 from ..services.url_service import get_url_service
-from ..services.firebase_service import get_firebase_service
-from ..services.api_token_service import get_api_token_service
+from ..services.firebase_service import FirebaseService, get_firebase_service
+from ..services.api_token_service import APITokenService, get_api_token_service
+from ..services.analytics_service import get_analytics_service
 from ..utils.file_utils import validate_file_extension
 from ..core.exceptions import UnsupportedFileTypeError, FileSizeError
+from ..utils.token_cache import (
+    API_TOKEN_AUTH, FIREBASE_AUTH, failure_reason, resolve_identity_async, token_key
+)
 
 settings = get_settings()
 
@@ -20,9 +23,6 @@ async def validate_upload_file(file: UploadFile = File(...)) -> UploadFile:
         # Validate file extension
         validate_file_extension(file.filename)
 
-        # Reset file pointer
-        file.file.seek(0)
-
         return file
 
     except UnsupportedFileTypeError as e:
@@ -42,114 +42,80 @@ def get_url_dependency():
     return get_url_service()
 
 
+def get_firebase_dependency():
+    """Dependency to get FirebaseService."""
+    return get_firebase_service()
+
+
+def get_api_token_dependency():
+    """Dependency to get APITokenService."""
+    return get_api_token_service()
+
+
 # Authentication dependencies
 security = HTTPBearer()
 
-
-async def get_current_user_firebase(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
+# Details for the fixed auth failures. Each failure raises a fresh
+# HTTPException: a shared instance raised by concurrent requests would have
+# its traceback and context rewritten under them.
+FIREBASE_UNAVAILABLE_DETAIL = "Firebase authentication not available"
+INVALID_TOKEN_DETAIL = "Invalid authentication token"
+INVALID_API_TOKEN_DETAIL = "Invalid or expired API token"
+
+async def get_current_user_firebase(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    firebase_service: FirebaseService = Depends(get_firebase_dependency)
+) -> Dict[str, Any]:
     """Get current user from Firebase ID token."""
-    firebase_service = get_firebase_service()
-    
     if not firebase_service.is_available():
-        raise HTTPException(
-            status_code=503, 
-            detail="Firebase authentication not available"
-        )
+        raise HTTPException(status_code=503, detail=FIREBASE_UNAVAILABLE_DETAIL)
     
-    try:
-        decoded_token = await firebase_service.verify_id_token(credentials.credentials)
-        return decoded_token
-    except FirebaseError as e:
+    identity = await resolve_identity_async(
+        credentials.credentials, (FIREBASE_AUTH,), firebase_service=firebase_service
+    )
+    if not identity:
+        # Include Firebase's reason when verification gave one
+        reason = failure_reason(token_key(credentials.credentials))
         raise HTTPException(
             status_code=401,
-            detail=f"Invalid authentication token: {str(e)}"
+            detail=f"{INVALID_TOKEN_DETAIL}: {reason}" if reason else INVALID_TOKEN_DETAIL
         )
 
+    return identity["firebase_token"]
 
-async def get_current_user_api_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+
+async def get_current_user_api_token(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    api_token_service: APITokenService = Depends(get_api_token_dependency)
+) -> str:
     """Get current user from API token."""
-    api_token_service = get_api_token_service()
-    
-    user_id = await api_token_service.verify_token(credentials.credentials)
-    if not user_id:
-        raise HTTPException(
-            status_code=401,
-            detail="Invalid or expired API token"
-        )
+    identity = await resolve_identity_async(
+        credentials.credentials, (API_TOKEN_AUTH,), api_token_service=api_token_service
+    )
+    if not identity:
+        raise HTTPException(status_code=401, detail=INVALID_API_TOKEN_DETAIL)
     
-    return user_id
+    return identity["user_id"]
 
 
 async def get_current_user_any(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
     """Get current user from either Firebase ID token or API token."""
-    # Try API token first (faster)
-    api_token_service = get_api_token_service()
-    user_id = await api_token_service.verify_token(credentials.credentials)
-    
-    if user_id:
-        return {
-            "user_id": user_id,
-            "auth_type": "api_token"
-        }
+    identity = await resolve_identity_async(credentials.credentials)
+    if identity:
+        return identity
     
-    # Try Firebase ID token
-    firebase_service = get_firebase_service()
-    if firebase_service.is_available():
-        try:
-            decoded_token = await firebase_service.verify_id_token(credentials.credentials)
-            return {
-                "user_id": decoded_token["uid"],
-                "auth_type": "firebase",
-                "firebase_token": decoded_token
-            }
-        except FirebaseError:
-            pass
-    
-    raise HTTPException(
-        status_code=401,
-        detail="Invalid authentication token"
-    )
+    raise HTTPException(status_code=401, detail=INVALID_TOKEN_DETAIL)
 
 
 async def get_optional_user(request: Request) -> Optional[Dict[str, Any]]:
     """Get current user if authenticated, otherwise return None."""
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
+    auth_header = request.headers.get("authorization")
+    if not auth_header or len(auth_header) < 8 or auth_header[:7] != "Bearer ":
         return None
     
-    token = auth_header.split(" ", 1)[1]
-    
-    # Try API token first
-    api_token_service = get_api_token_service()
-    user_id = await api_token_service.verify_token(token)
-    
-    if user_id:
-        return {
-            "user_id": user_id,
-            "auth_type": "api_token"
-        }
-    
-    # Try Firebase ID token
-    firebase_service = get_firebase_service()
-    if firebase_service.is_available():
-        try:
-            decoded_token = await firebase_service.verify_id_token(token)
-            return {
-                "user_id": decoded_token["uid"],
-                "auth_type": "firebase",
-                "firebase_token": decoded_token
-            }
-        except FirebaseError:
-            pass
-    
-    return None
-
+    return await resolve_identity_async(auth_header[7:])
 
-def get_firebase_dependency():
-    """Dependency to get FirebaseService."""
-    return get_firebase_service()
 
-
-def get_api_token_dependency():
-    """Dependency to get APITokenService."""
-    return get_api_token_service()
+def get_analytics_dependency():
+    """Dependency to get AnalyticsService."""
+    return get_analytics_service()
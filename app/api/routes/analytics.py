@@ -1,15 +1,16 @@
 """Analytics API routes for user data tracking and CRM dashboard."""
 
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from fastapi.security import HTTPBearer
+from fastapi.responses import Response
 
-from ..services.analytics_service import get_analytics_service
-from ..services.firebase_service import get_firebase_service
-from ..models.models import (
+from ...services.analytics_service import AnalyticsService
+from ..dependencies import get_analytics_dependency, get_current_user_firebase
+from ...utils.cache import SWRCache
+from ...models.models import (
     UserAnalytics, 
     AnalyticsDashboard,
     RealTimeStats,
@@ -18,31 +19,47 @@ from ..models.models import (
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
-security = HTTPBearer()
 
+_DAY = timedelta(days=1)
+_DEFAULT_RANGE = timedelta(days=30)
+_MAX_RANGE_DAYS = 365
 
-async def get_current_user(token: str = Depends(security)):
-    """Get current authenticated user from Firebase token."""
-    firebase_service = get_firebase_service()
-    try:
-        user = await firebase_service.verify_token(token.credentials)
-        return user
-    except Exception as e:
-        logger.error(f"Token verification failed: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+# Short-lived per-user caches for read-heavy, staleness-tolerant endpoints.
+# Past fresh_ttl the cached body is still served while it is rebuilt.
+_dashboard_cache = SWRCache(maxsize=10_000, fresh_ttl=30, stale_ttl=300)
+_real_time_cache = SWRCache(maxsize=10_000, fresh_ttl=5, stale_ttl=30)
+
+
+def _json_response(body: str) -> Response:
+    """Wrap an already-serialized model as a JSON response.
+
+    Returning a Response skips FastAPI's response_model re-validation; the
+    response_model declarations are kept for the OpenAPI schema.
+    """
+    return Response(content=body, media_type="application/json")
+
+
+async def _dashboard_body(analytics_service: AnalyticsService, user_id: str) -> str:
+    dashboard_data = await analytics_service.get_analytics_dashboard(user_id)
+    return dashboard_data.model_dump_json()
+
+
+async def _real_time_body(analytics_service: AnalyticsService, user_id: str) -> str:
+    real_time_stats = RealTimeStats(**await analytics_service.get_real_time_stats(user_id))
+    return real_time_stats.model_dump_json()
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Treat naive query datetimes as UTC so they compare with aware ones."""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
 
 
 @router.get("/analytics/dashboard", response_model=AnalyticsDashboard)
 async def get_analytics_dashboard(
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user_firebase),
+    analytics_service: AnalyticsService = Depends(get_analytics_dependency)
 ):
     """Get comprehensive analytics dashboard for the authenticated user."""
-    analytics_service = get_analytics_service()
-    
     if not analytics_service.is_available():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -50,9 +67,11 @@ async def get_analytics_dashboard(
         )
     
     try:
-        user_id = current_user.get("uid")
-        dashboard_data = await analytics_service.get_analytics_dashboard(user_id)
-        return dashboard_data
+        user_id = current_user["uid"]
+        body = await _dashboard_cache.get_or_fetch(
+            user_id, lambda: _dashboard_body(analytics_service, user_id)
+        )
+        return _json_response(body)
     
     except Exception as e:
         logger.error(f"Failed to get analytics dashboard: {str(e)}")
@@ -66,11 +85,10 @@ async def get_analytics_dashboard(
 async def get_analytics_summary(
     start_date: Optional[datetime] = Query(None, description="Start date for analytics (ISO format)"),
     end_date: Optional[datetime] = Query(None, description="End date for analytics (ISO format)"),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user_firebase),
+    analytics_service: AnalyticsService = Depends(get_analytics_dependency)
 ):
     """Get analytics summary for a specific date range."""
-    analytics_service = get_analytics_service()
-    
     if not analytics_service.is_available():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -78,13 +96,11 @@ async def get_analytics_summary(
         )
     
     try:
-        user_id = current_user.get("uid")
+        user_id = current_user["uid"]
         
         # Default to last 30 days if no dates provided
-        if not end_date:
-            end_date = datetime.utcnow()
-        if not start_date:
-            start_date = end_date - timedelta(days=30)
+        end_date = _as_utc(end_date) if end_date else datetime.now(timezone.utc)
+        start_date = _as_utc(start_date) if start_date else end_date - _DEFAULT_RANGE
         
         # Validate date range
         if start_date >= end_date:
@@ -94,7 +110,7 @@ async def get_analytics_summary(
             )
         
         # Limit to maximum 1 year range
-        if (end_date - start_date).days > 365:
+        if (end_date - start_date).days > _MAX_RANGE_DAYS:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Date range cannot exceed 365 days"
@@ -103,7 +119,7 @@ async def get_analytics_summary(
         analytics_data = await analytics_service.get_user_analytics(
             user_id, start_date, end_date
         )
-        return analytics_data
+        return _json_response(analytics_data.model_dump_json())
     
     except HTTPException:
         raise
@@ -117,11 +133,10 @@ async def get_analytics_summary(
 
 @router.get("/analytics/real-time", response_model=RealTimeStats)
 async def get_real_time_stats(
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user_firebase),
+    analytics_service: AnalyticsService = Depends(get_analytics_dependency)
 ):
     """Get real-time statistics for today."""
-    analytics_service = get_analytics_service()
-    
     if not analytics_service.is_available():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -129,10 +144,11 @@ async def get_real_time_stats(
         )
     
     try:
-        user_id = current_user.get("uid")
-        real_time_stats = await analytics_service.get_real_time_stats(user_id)
-        
-        return RealTimeStats(**real_time_stats)
+        user_id = current_user["uid"]
+        body = await _real_time_cache.get_or_fetch(
+            user_id, lambda: _real_time_body(analytics_service, user_id)
+        )
+        return _json_response(body)
     
     except Exception as e:
         logger.error(f"Failed to get real-time stats: {str(e)}")
@@ -145,11 +161,10 @@ async def get_real_time_stats(
 @router.get("/analytics/trends")
 async def get_usage_trends(
     days: int = Query(30, ge=1, le=90, description="Number of days to get trends for"),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user_firebase),
+    analytics_service: AnalyticsService = Depends(get_analytics_dependency)
 ):
     """Get usage trends for the specified number of days."""
-    analytics_service = get_analytics_service()
-    
     if not analytics_service.is_available():
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -157,9 +172,9 @@ async def get_usage_trends(
         )
     
     try:
-        user_id = current_user.get("uid")
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=days)
+        user_id = current_user["uid"]
+        end_date = datetime.now(timezone.utc)
+        start_date = end_date - days * _DAY
         
         analytics_data = await analytics_service.get_user_analytics(
             user_id, start_date, end_date
@@ -184,13 +199,13 @@ async def get_usage_trends(
 
 
 @router.get("/analytics/health")
-async def get_analytics_health():
+async def get_analytics_health(
+    analytics_service: AnalyticsService = Depends(get_analytics_dependency)
+):
     """Check analytics service health."""
-    analytics_service = get_analytics_service()
-    
     return {
         "status": "healthy" if analytics_service.is_available() else "unavailable",
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
         "service": "analytics"
     }
 
@@ -200,7 +215,7 @@ async def get_analytics_health():
 async def get_all_users_analytics(
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user_firebase)
 ):
     """Get aggregated analytics for all users (admin only)."""
     # This would require admin role checking
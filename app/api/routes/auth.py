@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends, Request
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from datetime import datetime, timezone, timedelta
 from typing import List
+import anyio
 import jwt
 from jwt.exceptions import PyJWTError
 from firebase_admin.exceptions import FirebaseError
@@ -17,12 +18,21 @@ from ..dependencies import (
     get_current_user_firebase, get_current_user_api_token, 
     get_current_user_any, get_firebase_dependency, get_api_token_dependency
 )
-from ...middleware.rate_limit import limiter, RateLimitConfig
+from ...utils.token_cache import invalidate_user
+from ...middleware.rate_limit import rate_limit, RateLimitConfig
 from ...core.config.config import get_settings
 
 settings = get_settings()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# Legacy JWT settings, resolved once instead of on every login/verify
+_JWT = jwt.PyJWT()
+_JWT_KEY = settings.jwt_secret_key.encode()
+_JWT_ALG = settings.jwt_algorithm
+_JWT_ALGS = [_JWT_ALG]
+_JWT_DECODE_OPTIONS = {"require": ["exp", "sub"]}
+_JWT_EXP_DELTA = timedelta(hours=1)
+
 auth_router = APIRouter(
     prefix="/auth",
     tags=["Authentication"]
@@ -30,33 +40,38 @@ auth_router = APIRouter(
 
 # Legacy endpoints (keep for backward compatibility)
 @auth_router.post("/register")
-@limiter.limit(RateLimitConfig.ANONYMOUS_PER_MINUTE)
+@rate_limit(RateLimitConfig.ANONYMOUS_PER_MINUTE)
 async def register(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     """Legacy user registration endpoint."""
-    if not register_user(form_data.username, form_data.password):
+    registered = await anyio.to_thread.run_sync(
+        register_user, form_data.username, form_data.password
+    )
+    if not registered:
         raise HTTPException(status_code=400, detail="Username already taken")
     return {"message": "User registered"}
 
 
 @auth_router.post("/login", response_model=Token)
-@limiter.limit(RateLimitConfig.ANONYMOUS_PER_MINUTE)
+@rate_limit(RateLimitConfig.ANONYMOUS_PER_MINUTE)
 async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     """Legacy user login endpoint."""
-    user_id = authenticate_user(form_data.username, form_data.password)
+    user_id = await anyio.to_thread.run_sync(
+        authenticate_user, form_data.username, form_data.password
+    )
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     token_data = {
         "sub": form_data.username,
-        "exp": datetime.now(timezone.utc) + timedelta(hours=1)
+        "exp": datetime.now(timezone.utc) + _JWT_EXP_DELTA
     }
-    token = jwt.encode(token_data, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
+    token = _JWT.encode(token_data, _JWT_KEY, algorithm=_JWT_ALG)
     return {"access_token": token, "token_type": "bearer"}
 
 
 # Firebase Authentication Endpoints
 @auth_router.post("/firebase/register", response_model=FirebaseUserResponse)
-@limiter.limit(RateLimitConfig.ANONYMOUS_PER_MINUTE)
+@rate_limit(RateLimitConfig.ANONYMOUS_PER_MINUTE)
 async def firebase_register(
     request: Request,
     user_data: FirebaseUserCreate,
@@ -109,6 +124,7 @@ async def firebase_revoke_tokens(
     """Revoke all refresh tokens for the current user."""
     try:
         await firebase_service.revoke_refresh_tokens(current_user["uid"])
+        invalidate_user(current_user["uid"])
         return {"message": "All refresh tokens revoked"}
     except FirebaseError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -149,6 +165,7 @@ async def revoke_api_token(
     success = await token_service.revoke_token(current_user["user_id"], token_id)
     if not success:
         raise HTTPException(status_code=404, detail="Token not found")
+    invalidate_user(current_user["user_id"])
     return {"message": "Token revoked successfully"}
 
 
@@ -159,6 +176,7 @@ async def revoke_all_api_tokens(
 ):
     """Revoke all API tokens for the authenticated user."""
     count = await token_service.revoke_all_tokens(current_user["user_id"])
+    invalidate_user(current_user["user_id"])
     return {"message": f"{count} tokens revoked successfully"}
 
 
@@ -179,7 +197,9 @@ async def verify_token(
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
     """Legacy function for getting current user from JWT token."""
     try:
-        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+        payload = _JWT.decode(
+            token, _JWT_KEY, algorithms=_JWT_ALGS, options=_JWT_DECODE_OPTIONS
+        )
         sub = payload.get("sub")
         if not sub:
             raise HTTPException(
@@ -1,6 +1,5 @@
 from fastapi import APIRouter, Depends, UploadFile, HTTPException, Form
-from fastapi.responses import PlainTextResponse, HTMLResponse, JSONResponse
-import json
+from fastapi.responses import PlainTextResponse, HTMLResponse, Response
 from pathlib import Path
 
 from ...models.enums import OutputFormat
@@ -21,6 +20,25 @@ router = APIRouter(
     tags=["documents"]
 )
 
+# Response builders per output format; formats without a builder (and
+# failed results, which carry no content) fall back to ProcessingResponse.
+_RESPONSE_BUILDERS = {
+    OutputFormat.HTML: lambda content: HTMLResponse(content=content),
+    OutputFormat.TEXT: lambda content: PlainTextResponse(content=content),
+    OutputFormat.MARKDOWN: lambda content: PlainTextResponse(content=content),
+    OutputFormat.DOCTAGS: lambda content: PlainTextResponse(content=content),
+    # JSON content is already serialized; send it as is
+    OutputFormat.JSON: lambda content: Response(content=content, media_type="application/json"),
+}
+
+
+def _build_response(dest_format: OutputFormat, result: ProcessingResponse):
+    """Wrap processed content in the response type for dest_format."""
+    builder = _RESPONSE_BUILDERS.get(dest_format)
+    if builder is None or result.content is None:
+        return result
+    return builder(result.content)
+
 
 @router.post("/upload", response_model=ProcessingResponse)
 async def upload_document(
@@ -40,7 +58,7 @@ async def upload_document(
 
     try:
         # Save uploaded file
-        temp_file = await save_upload_file(file.file, file.filename)
+        temp_file = await save_upload_file(file, file.filename)
 
         # Process document
         result = await docling_service.process_document(
@@ -48,15 +66,7 @@ async def upload_document(
         )
 
         # Return appropriate response format
-        match dest_format:
-            case OutputFormat.HTML:
-                return HTMLResponse(content=result.content)
-            case [OutputFormat.TEXT, OutputFormat.MARKDOWN, OutputFormat.DOCTAGS]:
-                return PlainTextResponse(content=result.content)
-            case OutputFormat.JSON:
-                return JSONResponse(content=json.loads(result.content))
-            case _:
-                return result
+        return _build_response(dest_format, result)
 
     except DoclingAPIException as e:
         raise create_http_exception(e)
@@ -88,15 +98,7 @@ async def process_url(
         )
 
         # Return appropriate response format
-        match request.dest_format:
-            case OutputFormat.HTML:
-                return HTMLResponse(content=result.content)
-            case [OutputFormat.TEXT, OutputFormat.MARKDOWN, OutputFormat.DOCTAGS]:
-                return PlainTextResponse(content=result.content)
-            case OutputFormat.JSON:
-                return JSONResponse(content=json.loads(result.content))
-            case _:
-                return result
+        return _build_response(request.dest_format, result)
 
     except DoclingAPIException as e:
         raise create_http_exception(e)
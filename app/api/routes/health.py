@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends
+import anyio
 import time
 from datetime import datetime
 
@@ -8,14 +9,34 @@ from ...services.docling_service import DoclingService
 from ..dependencies import get_docling_dependency
 
 settings = get_settings()
+_VERSION = settings.version
 
 router = APIRouter(
     prefix="/health", 
     tags=["health"]
 )
 
-# Track startup time
-startup_time = time.time()
+# Track startup time on the monotonic clock so uptime ignores wall-clock jumps
+startup_time = time.monotonic()
+
+# Probe results are reused for this long so liveness-probe storms don't
+# reach the converter
+PROBE_TTL_SECONDS = 5.0
+_last_probe = (float("-inf"), False)
+
+
+async def _probe_docling(docling_service: DoclingService) -> bool:
+    """Return the Docling health status, re-checking at most every PROBE_TTL_SECONDS."""
+    global _last_probe
+    now = time.monotonic()
+    checked_at, available = _last_probe
+    if now - checked_at < PROBE_TTL_SECONDS:
+        return available
+
+    # The first probe may build the DocumentConverter; keep it off the loop
+    available = await anyio.to_thread.run_sync(docling_service.health_check)
+    _last_probe = (now, available)
+    return available
 
 
 @router.get("/", response_model=HealthResponse)
@@ -23,11 +44,11 @@ async def health_check(
     docling_service: DoclingService = Depends(get_docling_dependency)
 ):
     """Health check endpoint."""
-    uptime = time.time() - startup_time
-    docling_available = docling_service.health_check()
+    uptime = time.monotonic() - startup_time
+    docling_available = await _probe_docling(docling_service)
 
     return HealthResponse(
-        version=settings.version,
+        version=_VERSION,
         uptime=uptime,
         docling_available=docling_available
     )
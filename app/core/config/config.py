@@ -1,17 +1,25 @@
-from functools import lru_cache
+from functools import cached_property, lru_cache
 from pathlib import Path
-from pydantic_settings import BaseSettings
-from typing import Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import FrozenSet, Optional
 import os
 
 
 class Settings(BaseSettings):
     """Application settings with environment variable support."""
 
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=False,
+        frozen=True
+    )
+
     # API Configuration
     app_name: str = "Docling NLP API"
     version: str = "1.0.0"
     debug: bool = False
+    workers: int = 1  # Each worker loads its own Docling models
+    server: str = "uvicorn"  # "uvicorn" or "granian"
 
     # File handling
     upload_dir: str = "uploads"
@@ -23,10 +31,13 @@ class Settings(BaseSettings):
     # Docling Configuration
     docling_cache_size: int = 1
     enable_ocr: bool = True
+    docling_warmup: bool = True  # Load PDF pipeline models at startup
+    docling_workers: int = 0  # Conversion processes; 0 converts in a thread
 
     # URL Processing
     url_timeout: int = 30
     max_url_file_size: int = 100 * 1024 * 1024  # 100MB
+    url_in_memory_max_size: int = 64 * 1024 * 1024  # Smaller URL downloads skip the disk
 
     # Logging
     log_level: str = "INFO"
@@ -48,10 +59,13 @@ class Settings(BaseSettings):
     max_api_tokens_per_user: int = 5
     jwt_secret_key: str = "your-super-secret-jwt-key-change-in-production"
     jwt_algorithm: str = "HS256"
+    bcrypt_rounds: int = 12  # Cost of new password hashes; existing ones keep theirs
+    pbkdf2_iterations: int = 100_000  # Message key stretching; changing it breaks existing ciphertexts
 
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
+    @cached_property
+    def allowed_extensions_set(self) -> FrozenSet[str]:
+        """Lowercased allowed extensions for O(1) membership checks."""
+        return frozenset(ext.lower() for ext in self.allowed_extensions)
 
 
 @lru_cache()
@@ -24,31 +24,78 @@
 # app.include_router(auth_router, prefix="/auth")
 # app.include_router(user_router, prefix="/users")
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+import anyio
 import time
 
 from .core.config.config import get_settings
 from .core.exceptions import DoclingAPIException
 from .api.routes import docs, health, auth, analytics
 from .utils.logger import setup_logger
-from .middleware.rate_limit import limiter, rate_limit_exceeded_handler
-from .middleware.analytics_middleware import AnalyticsMiddleware
+from .middleware.analytics_middleware import (
+    AnalyticsMiddleware, start_analytics_workers, stop_analytics_workers
+)
+from .middleware.auth_resolution import AuthResolutionMiddleware
+from .middleware.rate_limit import close_rate_limit_backend, init_rate_limit_backend
 from .utils.db import init_db
-from slowapi import _rate_limit_exceeded_handler
-from slowapi.errors import RateLimitExceeded
+from .utils.file_utils import close_http_session
+from .services.firebase_service import get_firebase_service
+from .services.api_token_service import get_api_token_service
+from .services.analytics_service import get_analytics_service
+from .services.docling_service import (
+    get_docling_service, start_docling_workers, stop_docling_workers
+)
+from .services.url_service import get_url_service
 
 
 settings = get_settings()
 logger = setup_logger(__name__, settings.log_level)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize services before the first request is accepted."""
+    # Blocking DB and password-hashing work runs in the default thread pool
+    anyio.to_thread.current_default_thread_limiter().total_tokens = 64
+
+    init_db()
+    logger.info("Database initialized")
+    
+    # Initialize services; Firebase first, analytics reuses its app
+    firebase_service = get_firebase_service()
+    get_api_token_service()
+    analytics_service = get_analytics_service()
+    get_docling_service()
+    get_url_service()
+    
+    logger.info(f"Firebase available: {firebase_service.is_available()}")
+    logger.info("API token service initialized")
+    logger.info(f"Analytics service available: {analytics_service.is_available()}")
+
+    # Build the DocumentConverter(s) and load models before the first upload
+    await start_docling_workers()
+
+    await init_rate_limit_backend()
+    start_analytics_workers()
+    yield
+    await stop_analytics_workers()
+    await stop_docling_workers()
+    await close_http_session()
+    await close_rate_limit_backend()
+    get_api_token_service().flush_last_used()
+
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.app_name,
     version=settings.version,
     description="A production-ready API for document processing using Docling",
-    debug=settings.debug
+    debug=settings.debug,
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -64,40 +111,18 @@ app.add_middleware(
 app.add_middleware(AnalyticsMiddleware)
 logger.info("Analytics middleware enabled")
 
-# Add rate limiting middleware
+# Rate limits are applied per route by the rate_limit decorator
 if settings.enable_rate_limiting:
-    from slowapi.middleware import SlowAPIMiddleware
-    app.state.limiter = limiter
-    app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
-    app.add_middleware(SlowAPIMiddleware)
     logger.info("Rate limiting enabled")
 
-# Initialize database on startup
-@app.on_event("startup")
-async def startup_event():
-    """Initialize services on startup."""
-    init_db()
-    logger.info("Database initialized")
-    
-    # Initialize services
-    from .services.firebase_service import get_firebase_service
-    from .services.api_token_service import get_api_token_service
-    from .services.analytics_service import get_analytics_service
-    
-    firebase_service = get_firebase_service()
-    api_token_service = get_api_token_service()
-    analytics_service = get_analytics_service()
-    
-    logger.info(f"Firebase available: {firebase_service.is_available()}")
-    logger.info("API token service initialized")
-    logger.info(f"Analytics service available: {analytics_service.is_available()}")
-
+# Resolve the bearer token once per request; added last so it runs first
+app.add_middleware(AuthResolutionMiddleware)
 
 # Exception handlers
 @app.exception_handler(DoclingAPIException)
 async def docling_exception_handler(request, exc: DoclingAPIException):
     """Handle custom Docling API exceptions."""
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=400,
         content={
             "error": exc.__class__.__name__,
@@ -110,13 +135,14 @@ async def docling_exception_handler(request, exc: DoclingAPIException):
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc: HTTPException):
     """Handle HTTP exceptions with consistent format."""
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "error": "HTTPException",
             "detail": exc.detail,
             "timestamp": time.time()
-        }
+        },
+        headers=exc.headers
     )
 
 
@@ -138,6 +164,40 @@ async def root():
     }
 
 
-if __name__ == "__main__":
+def _serve_with_granian() -> bool:
+    """Run under Granian's Rust HTTP server if it is installed."""
+    try:
+        from granian import Granian
+        from granian.constants import Interfaces
+    except ImportError:
+        logger.warning("SERVER=granian but granian is not installed, using uvicorn")
+        return False
+
+    Granian(
+        "app.main:app",
+        address="0.0.0.0",
+        port=8000,
+        interface=Interfaces.ASGI,
+        workers=settings.workers,
+        backlog=4096
+    ).serve()
+    return True
+
+
+def _serve_with_uvicorn() -> None:
+    """Run under Uvicorn; loop/http "auto" pick uvloop and httptools when installed."""
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="auto",
+        http="auto",
+        workers=settings.workers,
+        backlog=4096
+    )
+
+
+if __name__ == "__main__":
+    if not (settings.server == "granian" and _serve_with_granian()):
+        _serve_with_uvicorn()
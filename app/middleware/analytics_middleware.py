@@ -3,147 +3,179 @@
 import time
 import logging
 import asyncio
-from typing import Callable
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
-from starlette.types import ASGIApp
+from typing import List, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from ..services.analytics_service import get_analytics_service
+from ..models.events import AnalyticsEvent, APIUsageEvent, DocumentProcessingEvent
+from ..services.analytics_service import AnalyticsService, get_analytics_service
 
 logger = logging.getLogger(__name__)
 
+# Bounded so a slow analytics backend sheds events instead of memory
+ANALYTICS_QUEUE_SIZE = 10_000
+ANALYTICS_BATCH_SIZE = 500  # Firestore's WriteBatch limit
+ANALYTICS_FLUSH_INTERVAL = 0.25  # Seconds a partial batch waits for more events
+ANALYTICS_WORKERS = 2
 
-class AnalyticsMiddleware(BaseHTTPMiddleware):
-    """Middleware to track API usage for analytics."""
+# Docs and probe endpoints: no analytics, and no identity resolution either
+UNTRACKED_PATHS = (
+    "/docs",
+    "/redoc", 
+    "/openapi.json",
+    "/health",
+    "/favicon.ico",
+    "/api/analytics/health"
+)
+
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+dropped_events = 0
+
+
+class AnalyticsMiddleware:
+    """Pure ASGI middleware to track API usage for analytics."""
     
     def __init__(
         self,
         app: ASGIApp,
         exclude_paths: list = None
     ):
-        super().__init__(app)
-        self.exclude_paths = exclude_paths or [
-            "/docs",
-            "/redoc", 
-            "/openapi.json",
-            "/health",
-            "/favicon.ico",
-            "/analytics/health"
-        ]
+        self.app = app
+        # A tuple lets str.startswith test every prefix in one C-level call
+        self.exclude_paths = tuple(exclude_paths or UNTRACKED_PATHS)
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Process request and track analytics."""
-        start_time = time.time()
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Process request and queue its analytics event."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
         # Skip tracking for excluded paths
-        if any(request.url.path.startswith(path) for path in self.exclude_paths):
-            return await call_next(request)
-        
-        # Get request size
-        request_size = 0
-        if hasattr(request, "body"):
-            try:
-                body = await request.body()
-                request_size = len(body) if body else 0
-            except Exception:
-                request_size = 0
+        if scope["path"].startswith(self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
         
-        # Process request
-        response = await call_next(request)
+        start_ns = time.perf_counter_ns()
+        status_code = 500
+        response_size = 0
         
-        # Calculate processing time
-        processing_time_ms = (time.time() - start_time) * 1000
+        # Get request size from the header instead of touching the body
+        request_size = 0
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                request_size = int(value) if value.isdigit() else 0
+                break
         
-        # Get response size (estimate)
-        response_size = 0
-        if hasattr(response, "body"):
-            try:
-                response_size = len(response.body) if response.body else 0
-            except Exception:
-                response_size = 0
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
         
-        # Track analytics asynchronously (fire and forget)
-        asyncio.create_task(
-            self._track_analytics(
-                request=request,
-                response=response,
-                processing_time_ms=processing_time_ms,
-                request_size=request_size,
-                response_size=response_size
-            )
-        )
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Unauthenticated requests are never tracked; the user was
+            # resolved up front by AuthResolutionMiddleware
+            user_id = scope.get("state", {}).get("user_id")
+            if user_id:
+                _enqueue(APIUsageEvent(
+                    user_id=user_id,
+                    endpoint=scope["path"],
+                    method=scope["method"],
+                    status_code=status_code,
+                    response_time_ms=(time.perf_counter_ns() - start_ns) / 1e6,
+                    request_size_bytes=request_size,
+                    response_size_bytes=response_size,
+                    error_message=f"HTTP {status_code}" if status_code >= 400 else None
+                ))
+
+
+def _enqueue(event: AnalyticsEvent) -> None:
+    """Hand an event to the analytics workers without waiting."""
+    global dropped_events
+    if _queue is None:
+        return
+    try:
+        _queue.put_nowait(event)
+    except asyncio.QueueFull:
+        dropped_events += 1
+        if dropped_events % 1000 == 1:
+            logger.warning(f"Analytics queue full, {dropped_events} events dropped so far")
+
+
+async def _track_batch(analytics_service: AnalyticsService, events: List[AnalyticsEvent]) -> None:
+    """Store queued events as one batch."""
+    try:
+        if not analytics_service.is_available():
+            return
         
-        return response
+        await analytics_service.track_events_batch(events)
     
-    async def _track_analytics(
-        self,
-        request: Request,
-        response: Response,
-        processing_time_ms: float,
-        request_size: int,
-        response_size: int
-    ):
-        """Track analytics data asynchronously."""
+    except Exception as e:
+        # Log error but never let a bad batch stop the worker
+        logger.warning(f"Failed to track analytics: {str(e)}")
+
+
+async def _analytics_worker(queue: asyncio.Queue, analytics_service: AnalyticsService) -> None:
+    """Flush batches of up to ANALYTICS_BATCH_SIZE events, or whatever
+    arrived within ANALYTICS_FLUSH_INTERVAL of the first one."""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + ANALYTICS_FLUSH_INTERVAL
         try:
-            analytics_service = get_analytics_service()
-            
-            if not analytics_service.is_available():
-                return
-            
-            # Extract user ID from request
-            user_id = await self._extract_user_id(request)
-            
-            if not user_id:
-                # Skip tracking for unauthenticated requests
-                return
-            
-            # Determine error message if applicable
-            error_message = None
-            if response.status_code >= 400:
-                error_message = f"HTTP {response.status_code}"
-            
-            # Track API usage
-            await analytics_service.track_api_usage(
-                user_id=user_id,
-                endpoint=request.url.path,
-                method=request.method,
-                status_code=response.status_code,
-                response_time_ms=processing_time_ms,
-                request_size_bytes=request_size,
-                response_size_bytes=response_size,
-                error_message=error_message
-            )
-            
-        except Exception as e:
-            # Log error but don't affect the main request
-            logger.warning(f"Failed to track analytics: {str(e)}")
+            while len(batch) < ANALYTICS_BATCH_SIZE:
+                if not queue.empty():
+                    batch.append(queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # Shutting down: don't lose the partial batch
+            await _track_batch(analytics_service, batch)
+            raise
+        await _track_batch(analytics_service, batch)
+
+
+def start_analytics_workers() -> None:
+    """Create the analytics queue and its workers on the running loop."""
+    global _queue
+    _queue = asyncio.Queue(maxsize=ANALYTICS_QUEUE_SIZE)
+    analytics_service = get_analytics_service()
+    _workers[:] = [
+        asyncio.create_task(_analytics_worker(_queue, analytics_service))
+        for _ in range(ANALYTICS_WORKERS)
+    ]
+
+
+async def stop_analytics_workers() -> None:
+    """Stop the workers and flush any events still queued."""
+    global _queue
+    for worker in _workers:
+        worker.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
     
-    async def _extract_user_id(self, request: Request) -> str:
-        """Extract user ID from request authorization header."""
-        try:
-            # Check for Authorization header
-            auth_header = request.headers.get("authorization")
-            if not auth_header or not auth_header.startswith("Bearer "):
-                return None
-            
-            # Extract token
-            token = auth_header.replace("Bearer ", "")
-            
-            # Use Firebase service to verify token and get user ID
-            from ..services.firebase_service import get_firebase_service
-            firebase_service = get_firebase_service()
-            
-            try:
-                user_info = await firebase_service.verify_token(token)
-                return user_info.get("uid")
-            except Exception:
-                # Invalid or expired token
-                return None
-                
-        except Exception as e:
-            logger.debug(f"Failed to extract user ID: {str(e)}")
-            return None
+    queue, _queue = _queue, None
+    if queue is None:
+        return
+    
+    # Flush in WriteBatch-sized slices; a failed slice is logged on its own
+    # and doesn't take the rest down with it
+    analytics_service = get_analytics_service()
+    while not queue.empty():
+        batch = []
+        while len(batch) < ANALYTICS_BATCH_SIZE and not queue.empty():
+            batch.append(queue.get_nowait())
+        await _track_batch(analytics_service, batch)
 
 
 class DocumentProcessingTracker:
@@ -164,10 +196,26 @@ class DocumentProcessingTracker:
         words_extracted: int = 0,
         error_message: str = None
     ):
-        """Track document processing for analytics."""
+        """Queue document processing analytics for the next batch write."""
         if not self.analytics_service.is_available():
             return
         
+        event = DocumentProcessingEvent(
+            user_id=user_id,
+            document_type=document_type,
+            file_size_bytes=file_size_bytes,
+            processing_time_ms=processing_time_ms,
+            output_format=output_format,
+            success=success,
+            pages_processed=pages_processed,
+            words_extracted=words_extracted,
+            error_message=error_message
+        )
+        if _queue is not None:
+            _enqueue(event)
+            return
+        
+        # No workers running (e.g. outside the app lifespan): write directly
         try:
             await self.analytics_service.track_document_processing(
                 user_id=user_id,
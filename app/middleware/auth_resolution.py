@@ -0,0 +1,45 @@
+"""Middleware that resolves the bearer token once per request."""
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..utils.token_cache import resolve_user_id_async
+from .analytics_middleware import UNTRACKED_PATHS
+from .rate_limit import TIER_BY_AUTH_TYPE, make_rl_key
+
+ANONYMOUS_TIER = "anonymous"
+
+
+class AuthResolutionMiddleware:
+    """
+    Pure ASGI middleware that stores the caller's identity in request state.
+    Sets state["user_id"] (None when anonymous), state["user_tier"] (the
+    auth type or "anonymous") and, for known users, state["rate_limit_key"]
+    for the rate limiter and analytics to read. Docs and health probes are
+    passed straight through.
+    """
+    
+    def __init__(self, app: ASGIApp, exclude_paths: tuple = UNTRACKED_PATHS):
+        self.app = app
+        self.exclude_paths = exclude_paths
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and not scope["path"].startswith(self.exclude_paths):
+            user_id = None
+            user_tier = ANONYMOUS_TIER
+            for name, value in scope["headers"]:
+                if name == b"authorization":
+                    if value.startswith(b"Bearer "):
+                        resolved = await resolve_user_id_async(value[7:].decode("latin-1"))
+                        if resolved:
+                            user_tier, user_id = resolved
+                    break
+            
+            state = scope.setdefault("state", {})
+            state["user_id"] = user_id
+            state["user_tier"] = user_tier
+            if user_id:
+                state["rate_limit_key"] = make_rl_key(
+                    TIER_BY_AUTH_TYPE[user_tier], user_id.encode()
+                )
+        
+        await self.app(scope, receive, send)
@@ -1,113 +1,150 @@
 """Rate limiting middleware."""
 
+import functools
+import hashlib
 import logging
-from typing import Callable, Optional
+import time
+from typing import Callable, Tuple
 from fastapi import Request, HTTPException
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
+from redis.asyncio import ConnectionPool, Redis
 
 from ..core.config.config import get_settings
-from ..services.firebase_service import get_firebase_service
-from ..services.api_token_service import get_api_token_service
+from ..utils.cache import TTLCache
+from .token_bucket import try_consume
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
-# Initialize the limiter with Redis backend if available, otherwise use in-memory
-try:
-    import redis
-    redis_client = redis.from_url(settings.redis_url)
-    redis_client.ping()  # Test connection
-    limiter = Limiter(
-        key_func=get_remote_address,
-        storage_uri=settings.redis_url
-    )
-    logger.info("Rate limiting initialized with Redis backend")
-except Exception as e:
-    logger.warning(f"Redis not available, using in-memory rate limiting: {e}")
-    limiter = Limiter(key_func=get_remote_address)
+# Token bucket evaluated atomically in Redis: one round trip per decision.
+# KEYS[1] = bucket key; ARGV = refill rate (tokens/ms), capacity, now (ms),
+# most tokens wanted. Grants as many whole tokens as are available, up to
+# that many. Returns {granted, remaining, retry_after_ms}.
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local want = tonumber(ARGV[4])
 
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
 
-def get_user_identifier(request: Request) -> str:
+local granted = math.min(want, math.floor(tokens))
+local retry_after = 0
+if granted >= 1 then
+    tokens = tokens - granted
+else
+    granted = 0
+    retry_after = math.ceil((1 - tokens) / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.max(1, math.ceil((capacity - tokens) / rate)))
+return {granted, math.floor(tokens), retry_after}
+"""
+
+# One shared async connection pool; reachability is checked at startup by
+# init_rate_limit_backend, until then the in-process bucket is used
+_redis_pool = ConnectionPool.from_url(
+    settings.redis_url,
+    max_connections=64,
+    socket_connect_timeout=1,
+    socket_timeout=1
+)
+redis_client = Redis(connection_pool=_redis_pool)
+token_bucket_script = redis_client.register_script(TOKEN_BUCKET_LUA)
+redis_available = False
+
+
+async def init_rate_limit_backend() -> bool:
+    """Use Redis for rate limiting if it answers a ping."""
+    global redis_available
+    try:
+        await redis_client.ping()
+        redis_available = True
+        logger.info("Rate limiting initialized with Redis backend")
+    except Exception as e:
+        redis_available = False
+        logger.warning(f"Redis not available, using in-memory rate limiting: {e}")
+    return redis_available
+
+
+async def close_rate_limit_backend() -> None:
+    """Release the Redis connection pool."""
+    await _redis_pool.disconnect()
+
+
+# Busy keys take tokens from Redis in leases and serve them locally, so most
+# of their requests skip the Redis round trip. A lease is sized from the
+# key's requests so far in the current RATE_LIMIT_LEASE_TTL window, capped at
+# 1/RATE_LIMIT_LEASE_FRACTION of the burst, so a key seen once per window
+# takes single tokens. Leased tokens unused after RATE_LIMIT_LEASE_TTL
+# seconds are lost from the shared bucket; sizing by observed rate bounds
+# that loss to about one window of the key's own traffic.
+RATE_LIMIT_LEASE_FRACTION = 10
+RATE_LIMIT_LEASE_TTL = 1.0
+_leases = TTLCache(maxsize=100_000, ttl=RATE_LIMIT_LEASE_TTL)
+# Key -> [requests seen in the current window]
+_request_counts = TTLCache(maxsize=100_000, ttl=RATE_LIMIT_LEASE_TTL)
+
+_PERIOD_SECONDS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400
+}
+
+
+def parse_rate_limit(limit_value: str) -> Tuple[int, int]:
+    """Parse a limit such as "30/minute" into (amount, period_seconds)."""
+    amount, _, period = limit_value.partition("/")
+    return int(amount), _PERIOD_SECONDS[period.strip().rstrip("s")]
+
+
+def get_client_address(request: Request) -> str:
+    """Get the client IP address, or a placeholder when unknown."""
+    return request.client.host if request.client else "127.0.0.1"
+
+
+# Rate-limit tiers, stored in the first byte of every rate-limit key
+TIER_ANONYMOUS = 0
+TIER_AUTHENTICATED = 1
+TIER_API_TOKEN = 2
+TIER_BY_AUTH_TYPE = {"firebase": TIER_AUTHENTICATED, "api_token": TIER_API_TOKEN}
+
+
+def make_rl_key(tier: int, uid_bytes: bytes) -> bytes:
+    """Build a fixed-width rate-limit key: tier byte + 8-byte BLAKE2b of the ID."""
+    return bytes((tier,)) + hashlib.blake2b(uid_bytes, digest_size=8).digest()
+
+
+def get_rate_limit_key(request: Request) -> bytes:
     """
-    Get user identifier for rate limiting.
+    Get the rate-limit key for a request.
     Priority: API Token > Firebase UID > IP Address
     """
-    # Try to get user from API token first
-    auth_header = request.headers.get("Authorization")
-    if auth_header and auth_header.startswith("Bearer "):
-        token = auth_header.split(" ", 1)[1]
-        
-        # Check if it's an API token
-        api_token_service = get_api_token_service()
-        user_id = None
-        try:
-            # This is a synchronous call - we might need to make it async later
-            import asyncio
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            user_id = loop.run_until_complete(api_token_service.verify_token(token))
-        except Exception as e:
-            logger.debug(f"Token verification failed: {e}")
-        
-        if user_id:
-            return f"api_token:{user_id}"
-        
-        # Check if it's a Firebase ID token
-        firebase_service = get_firebase_service()
-        if firebase_service.is_available():
-            try:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                decoded_token = loop.run_until_complete(firebase_service.verify_id_token(token))
-                if decoded_token:
-                    return f"firebase:{decoded_token['uid']}"
-            except Exception as e:
-                logger.debug(f"Firebase token verification failed: {e}")
+    # Computed once per request by AuthResolutionMiddleware
+    key = getattr(request.state, "rate_limit_key", None)
+    if key:
+        return key
     
     # Fall back to IP address
-    return get_remote_address(request)
-
-
-def get_user_identifier_async():
-    """Get user identifier function for async rate limiting."""
-    async def _get_user_id(request: Request) -> str:
-        """Async version of get_user_identifier."""
-        # Try to get user from API token first
-        auth_header = request.headers.get("Authorization")
-        if auth_header and auth_header.startswith("Bearer "):
-            token = auth_header.split(" ", 1)[1]
-            
-            # Check if it's an API token
-            api_token_service = get_api_token_service()
-            user_id = await api_token_service.verify_token(token)
-            if user_id:
-                return f"api_token:{user_id}"
-            
-            # Check if it's a Firebase ID token
-            firebase_service = get_firebase_service()
-            if firebase_service.is_available():
-                try:
-                    decoded_token = await firebase_service.verify_id_token(token)
-                    if decoded_token:
-                        return f"firebase:{decoded_token['uid']}"
-                except Exception as e:
-                    logger.debug(f"Firebase token verification failed: {e}")
-        
-        # Fall back to IP address
-        return get_remote_address(request)
-    
-    return _get_user_id
+    return make_rl_key(TIER_ANONYMOUS, get_client_address(request).encode())
 
 
-# Create limiter with user-aware rate limiting
-user_limiter = Limiter(
-    key_func=get_user_identifier_async(),
-    storage_uri=settings.redis_url if settings.redis_url != "redis://localhost:6379" else None
-)
+def get_user_identifier(request: Request) -> str:
+    """
+    Get user identifier for rate limiting.
+    Priority: API Token > Firebase UID > IP Address
+    """
+    # Resolved once per request by AuthResolutionMiddleware
+    user_id = getattr(request.state, "user_id", None)
+    if user_id:
+        return f"{request.state.user_tier}:{user_id}"
+    
+    # Fall back to IP address
+    return get_client_address(request)
 
 
 class RateLimitConfig:
@@ -129,35 +166,110 @@ class RateLimitConfig:
     API_TOKEN_PER_DAY = f"{settings.rate_limit_per_day * 2}/day"
 
 
+# (per minute, per hour, per day) limits indexed by tier
+RATES = (
+    (RateLimitConfig.ANONYMOUS_PER_MINUTE, RateLimitConfig.ANONYMOUS_PER_HOUR, RateLimitConfig.ANONYMOUS_PER_DAY),
+    (RateLimitConfig.AUTHENTICATED_PER_MINUTE, RateLimitConfig.AUTHENTICATED_PER_HOUR, RateLimitConfig.AUTHENTICATED_PER_DAY),
+    (RateLimitConfig.API_TOKEN_PER_MINUTE, RateLimitConfig.API_TOKEN_PER_HOUR, RateLimitConfig.API_TOKEN_PER_DAY)
+)
+
+
 def get_rate_limit_for_user(request: Request) -> str:
     """Get appropriate rate limit based on user type."""
-    user_id = get_user_identifier(request)
-    
-    if user_id.startswith("api_token:"):
-        return RateLimitConfig.API_TOKEN_PER_MINUTE
-    elif user_id.startswith("firebase:"):
-        return RateLimitConfig.AUTHENTICATED_PER_MINUTE
-    else:
-        return RateLimitConfig.ANONYMOUS_PER_MINUTE
+    return RATES[get_rate_limit_key(request)[0]][0]
 
 
-def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
-    """Custom rate limit exceeded handler."""
+def rate_limit_exceeded(request: Request, limit_value: str, retry_after_ms: int) -> HTTPException:
+    """Build the 429 response for a request over its limit."""
+    retry_after = max(1, -(-retry_after_ms // 1000))
     response = {
         "error": "Rate limit exceeded",
-        "detail": f"Too many requests. Limit: {exc.detail}",
-        "retry_after": exc.retry_after
+        "detail": f"Too many requests. Limit: {limit_value}",
+        "retry_after": retry_after
     }
     
     # Add user-specific messaging
-    user_id = get_user_identifier(request)
-    if user_id.startswith("api_token:") or user_id.startswith("firebase:"):
+    if getattr(request.state, "user_id", None):
         response["message"] = "Consider upgrading your plan for higher rate limits"
     else:
         response["message"] = "Sign in for higher rate limits"
     
-    return HTTPException(status_code=429, detail=response)
+    return HTTPException(
+        status_code=429,
+        detail=response,
+        headers={"Retry-After": str(retry_after)}
+    )
+
+
+async def _redis_take(key: str, rate_per_sec: float, burst: int, want: int) -> Tuple[int, int]:
+    """Take up to want tokens from the Lua bucket; return (granted, retry_after_ms)."""
+    granted, _, retry_after_ms = await token_bucket_script(
+        keys=[key], args=[rate_per_sec / 1000, burst, time.time_ns() // 1_000_000, want]
+    )
+    return int(granted), retry_after_ms
+
+
+async def _consume(key: str, rate_per_sec: float, burst: int) -> Tuple[bool, int]:
+    """Take one token from key's bucket; return (allowed, retry_after_ms)."""
+    if redis_available:
+        count = _request_counts.get(key)
+        if count is None:
+            count = [0]
+            _request_counts.set(key, count)
+        count[0] += 1
+
+        # Serve from tokens this process already took from Redis
+        lease = _leases.get(key)
+        if lease and lease[0] > 0:
+            lease[0] -= 1
+            return True, 0
+        
+        want = min(count[0], max(1, burst // RATE_LIMIT_LEASE_FRACTION))
+        try:
+            granted, retry_after_ms = await _redis_take(key, rate_per_sec, burst, want)
+            if not granted:
+                return False, retry_after_ms
+            if granted > 1:
+                _leases.set(key, [granted - 1])
+            return True, 0
+        except Exception as e:
+            logger.warning(f"Redis rate limiting failed, using in-memory bucket: {e}")
+    
+    if try_consume(key, rate_per_sec, burst):
+        return True, 0
+    return False, int(1000 / rate_per_sec)
+
+
+def rate_limit(limit_value: str) -> Callable:
+    """
+    Rate-limit an endpoint per user, or per client address when anonymous.
+    The token bucket lives in Redis when it is reachable, otherwise in
+    process, with the limit's average rate and a burst of its full amount.
+    """
+    amount, period_seconds = parse_rate_limit(limit_value)
+    burst = amount
+    rate_per_sec = amount / period_seconds
+
+    def decorator(func: Callable) -> Callable:
+        if not settings.enable_rate_limiting:
+            return func
+
+        key_prefix = f"rl:{func.__qualname__}:"
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            request = kwargs.get("request")
+            if request is not None:
+                key = key_prefix + get_rate_limit_key(request).hex()
+                allowed, retry_after_ms = await _consume(key, rate_per_sec, burst)
+                if not allowed:
+                    raise rate_limit_exceeded(request, limit_value, retry_after_ms)
+            return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
 
 
-# Export the limiter and middleware
-__all__ = ["limiter", "user_limiter", "RateLimitConfig", "get_user_identifier", "rate_limit_exceeded_handler"]
+# Export the limiter helpers
+__all__ = ["rate_limit", "RateLimitConfig", "make_rl_key", "get_rate_limit_key", "get_user_identifier", "get_rate_limit_for_user", "rate_limit_exceeded"]
@@ -0,0 +1,58 @@
+"""In-process token-bucket rate limiting."""
+
+import time
+from dataclasses import dataclass
+from typing import Dict
+
+_SWEEP_INTERVAL_NS = 60 * 1_000_000_000
+
+
+@dataclass
+class _Bucket:
+    tokens: float
+    updated_ns: int
+    full_at_ns: int
+
+
+_buckets: Dict[str, _Bucket] = {}
+_last_sweep_ns = time.monotonic_ns()
+
+
+def try_consume(key: str, rate_per_sec: float, burst: int) -> bool:
+    """Take one token from key's bucket; return False if it is empty.
+
+    Buckets refill continuously at rate_per_sec up to burst. All callers run
+    on the event loop thread and nothing here awaits, so no lock is needed.
+    """
+    now = time.monotonic_ns()
+    _maybe_sweep(now)
+
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = _buckets[key] = _Bucket(tokens=burst, updated_ns=now, full_at_ns=now)
+    else:
+        elapsed = now - bucket.updated_ns
+        bucket.tokens = min(burst, bucket.tokens + elapsed * rate_per_sec / 1e9)
+        bucket.updated_ns = now
+
+    if bucket.tokens < 1:
+        return False
+
+    bucket.tokens -= 1
+    bucket.full_at_ns = now + int((burst - bucket.tokens) / rate_per_sec * 1e9)
+    return True
+
+
+def _maybe_sweep(now: int) -> None:
+    """Evict buckets that have refilled completely, at most once a minute.
+
+    A full bucket behaves exactly like a missing one, so dropping it never
+    loosens a limit.
+    """
+    global _last_sweep_ns
+    if now - _last_sweep_ns < _SWEEP_INTERVAL_NS:
+        return
+
+    _last_sweep_ns = now
+    for key in [k for k, b in _buckets.items() if b.full_at_ns <= now]:
+        del _buckets[key]
@@ -1,7 +1,17 @@
+import sys
 from enum import Enum
 
+if sys.version_info >= (3, 11):
+    from enum import StrEnum
+else:
+    class StrEnum(str, Enum):
+        """Stand-in for enum.StrEnum (3.11+): members format as their value."""
 
-class DocumentType(str, Enum):
+        def __str__(self) -> str:
+            return str(self.value)
+
+
+class DocumentType(StrEnum):
     """Supported document input types."""
     PDF = "pdf"
     DOCX = "docx"
@@ -11,7 +21,7 @@ class DocumentType(str, Enum):
     MD = "md"
 
 
-class OutputFormat(str, Enum):
+class OutputFormat(StrEnum):
     """Supported output formats."""
     MARKDOWN = "markdown"
     HTML = "html"
@@ -20,7 +30,14 @@ class OutputFormat(str, Enum):
     DOCTAGS = "doctags"
 
 
-class ProcessingStatus(str, Enum):
+class MetadataLevel(StrEnum):
+    """How much document metadata to compute after conversion."""
+    NONE = "none"
+    BASIC = "basic"
+    FULL = "full"
+
+
+class ProcessingStatus(StrEnum):
     """Processing status enum."""
     PENDING = "pending"
     PROCESSING = "processing"
@@ -0,0 +1,38 @@
+"""Internal analytics events, kept out of pydantic validation."""
+
+import sys
+from dataclasses import dataclass
+from typing import Optional, Union
+
+# dataclass(slots=True) needs Python 3.10+; older interpreters get plain instances
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(frozen=True, **_SLOTS)
+class APIUsageEvent:
+    """One tracked API request, queued by the analytics middleware."""
+    user_id: str
+    endpoint: str
+    method: str
+    status_code: int
+    response_time_ms: float
+    request_size_bytes: int
+    response_size_bytes: int
+    error_message: Optional[str] = None
+
+
+@dataclass(frozen=True, **_SLOTS)
+class DocumentProcessingEvent:
+    """One processed document, queued by the document tracker."""
+    user_id: str
+    document_type: str
+    file_size_bytes: int
+    processing_time_ms: float
+    output_format: str
+    success: bool
+    pages_processed: int = 0
+    words_extracted: int = 0
+    error_message: Optional[str] = None
+
+
+AnalyticsEvent = Union[APIUsageEvent, DocumentProcessingEvent]
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, HttpUrl, Field, validator
+from pydantic import BaseModel, ConfigDict, HttpUrl, Field
 from typing import Optional, Dict, Any
 from datetime import datetime
 from .enums import OutputFormat, ProcessingStatus
@@ -10,13 +10,12 @@ class DocumentUploadRequest(BaseModel):
     use_ocr: bool = Field(
         default=False, description="Enable OCR for scanned documents")
 
-    class Config:
-        schema_extra = {
-            "example": {
-                "dest_format": "markdown",
-                "use_ocr": False
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "dest_format": "markdown",
+            "use_ocr": False
         }
+    })
 
 
 class URLProcessRequest(BaseModel):
@@ -26,14 +25,13 @@ class URLProcessRequest(BaseModel):
     use_ocr: bool = Field(
         default=False, description="Enable OCR for scanned documents")
 
-    class Config:
-        schema_extra = {
-            "example": {
-                "url": "https://example.com/document.pdf",
-                "dest_format": "markdown",
-                "use_ocr": False
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "url": "https://example.com/document.pdf",
+            "dest_format": "markdown",
+            "use_ocr": False
         }
+    })
 
 
 class ProcessingResponse(BaseModel):
@@ -44,16 +42,15 @@ class ProcessingResponse(BaseModel):
     processing_time: Optional[float] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
-    class Config:
-        schema_extra = {
-            "example": {
-                "status": "completed",
-                "content": "# Document Title\n\nDocument content...",
-                "metadata": {"page_count": 5, "word_count": 1250},
-                "processing_time": 2.5,
-                "created_at": "2024-01-01T00:00:00Z"
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "status": "completed",
+            "content": "# Document Title\n\nDocument content...",
+            "metadata": {"page_count": 5, "word_count": 1250},
+            "processing_time": 2.5,
+            "created_at": "2024-01-01T00:00:00Z"
         }
+    })
 
 
 class ErrorResponse(BaseModel):
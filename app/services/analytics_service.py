@@ -1,16 +1,19 @@
 """Analytics Service with Firebase Firestore for CRM Dashboard."""
 
 import json
+import asyncio
 import logging
-from typing import Dict, List, Optional, Any, Union
-from datetime import datetime, timedelta
-from collections import defaultdict
+from typing import Dict, List, Optional, Any, Tuple, Union
+from datetime import date, datetime, timedelta
+from collections import Counter, defaultdict
+from functools import lru_cache
 
 import firebase_admin
-from firebase_admin import firestore
+from firebase_admin import firestore, firestore_async
 from firebase_admin.exceptions import FirebaseError
 
 from ..core.config.config import get_settings
+from ..models.events import AnalyticsEvent, APIUsageEvent, DocumentProcessingEvent
 from ..models.models import (
     UserAnalytics, 
     APIUsageStats, 
@@ -22,12 +25,73 @@ from ..models.models import (
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+EPOCH = date(1970, 1, 1)
+
+# Raw API usage events carry a ttl_at this far out; a Firestore TTL policy
+# on the api_usage collection group deletes them after it passes
+RAW_EVENT_RETENTION_DAYS = 90
+
+# Daily, weekly and monthly rollup collections for each stats family
+API_USAGE_ROLLUPS = ('daily_stats', 'weekly_stats', 'monthly_stats')
+DOCUMENT_ROLLUPS = ('document_stats', 'weekly_document_stats', 'monthly_document_stats')
+
+
+def _epoch_day(day: date) -> int:
+    """Days since 1970-01-01, the indexed range key on daily stats."""
+    return (day - EPOCH).days
+
+
+def _week_key(day: date) -> str:
+    """ISO week period key, e.g. 2024_W07."""
+    iso_year, iso_week, _ = day.isocalendar()
+    return f"{iso_year}_W{iso_week:02d}"
+
+
+def _month_key(day: date) -> str:
+    """Calendar month period key, e.g. 2024_02."""
+    return f"{day.year}_{day.month:02d}"
+
+
+def _next_month(day: date) -> date:
+    """First day of the month after day's month."""
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _rollup_periods(start: date, end: date) -> Tuple[List[date], List[date], List[date]]:
+    """
+    Cover start..end with as few rollup documents as possible.
+    Returns the whole months, then whole ISO weeks, then leftover days.
+    """
+    months = []
+    month = start if start.day == 1 else _next_month(start)
+    while _next_month(month) - timedelta(days=1) <= end:
+        months.append(month)
+        month = _next_month(month)
+    
+    # Split what the months don't cover into weeks and days
+    if months:
+        segments = [(start, months[0] - timedelta(days=1)), (month, end)]
+    else:
+        segments = [(start, end)]
+    
+    weeks, days = [], []
+    for current, segment_end in segments:
+        while current <= segment_end:
+            if current.weekday() == 0 and current + timedelta(days=6) <= segment_end:
+                weeks.append(current)
+                current += timedelta(days=7)
+            else:
+                days.append(current)
+                current += timedelta(days=1)
+    return months, weeks, days
+
 
 class AnalyticsService:
     """Analytics service for user data tracking and CRM dashboard."""
     
     def __init__(self):
         self._db = None
+        self._collections: Dict[str, Any] = {}
         self._initialize_firestore()
     
     def _initialize_firestore(self):
@@ -36,8 +100,8 @@ class AnalyticsService:
             # Use the same Firebase app instance from firebase_service
             if firebase_admin._apps:
                 app = firebase_admin.get_app()
-                self._db = firestore.client(app)
-                logger.info("Firestore client initialized successfully")
+                self._db = firestore_async.client(app)
+                logger.info("Firestore async client initialized successfully")
             else:
                 logger.warning("Firebase app not initialized. Analytics will not work.")
         except Exception as e:
@@ -48,6 +112,13 @@ class AnalyticsService:
         """Check if Firestore is properly initialized."""
         return self._db is not None
     
+    def _collection(self, name: str):
+        """Return a CollectionReference, built once per collection name."""
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = self._db.collection(name)
+        return collection
+    
     async def track_api_usage(
         self, 
         user_id: str, 
@@ -60,33 +131,16 @@ class AnalyticsService:
         error_message: Optional[str] = None
     ) -> None:
         """Track API usage for analytics."""
-        if not self.is_available():
-            logger.warning("Firestore not available, skipping analytics tracking")
-            return
-        
-        try:
-            usage_data = {
-                'user_id': user_id,
-                'endpoint': endpoint,
-                'method': method,
-                'status_code': status_code,
-                'response_time_ms': response_time_ms,
-                'request_size_bytes': request_size_bytes,
-                'response_size_bytes': response_size_bytes,
-                'error_message': error_message,
-                'timestamp': firestore.SERVER_TIMESTAMP,
-                'date': datetime.utcnow().date().isoformat(),
-                'hour': datetime.utcnow().hour
-            }
-            
-            # Add to api_usage collection
-            self._db.collection('api_usage').add(usage_data)
-            
-            # Update user's daily stats
-            await self._update_daily_stats(user_id, usage_data)
-            
-        except Exception as e:
-            logger.error(f"Failed to track API usage: {str(e)}")
+        await self.track_events_batch([APIUsageEvent(
+            user_id=user_id,
+            endpoint=endpoint,
+            method=method,
+            status_code=status_code,
+            response_time_ms=response_time_ms,
+            request_size_bytes=request_size_bytes,
+            response_size_bytes=response_size_bytes,
+            error_message=error_message
+        )])
     
     async def track_document_processing(
         self,
@@ -101,139 +155,218 @@ class AnalyticsService:
         error_message: Optional[str] = None
     ) -> None:
         """Track document processing for analytics."""
+        await self.track_events_batch([DocumentProcessingEvent(
+            user_id=user_id,
+            document_type=document_type,
+            file_size_bytes=file_size_bytes,
+            processing_time_ms=processing_time_ms,
+            output_format=output_format,
+            success=success,
+            pages_processed=pages_processed,
+            words_extracted=words_extracted,
+            error_message=error_message
+        )])
+    
+    async def track_events_batch(self, events: List[AnalyticsEvent]) -> None:
+        """
+        Track a batch of API usage and document processing events.
+        All raw events go out in a single Firestore commit, then each user's
+        daily aggregates are updated once for the whole batch.
+        """
         if not self.is_available():
-            logger.warning("Firestore not available, skipping document processing tracking")
+            logger.warning("Firestore not available, skipping analytics tracking")
             return
         
         try:
-            doc_data = {
-                'user_id': user_id,
-                'document_type': document_type,
-                'file_size_bytes': file_size_bytes,
-                'processing_time_ms': processing_time_ms,
-                'output_format': output_format,
-                'success': success,
-                'pages_processed': pages_processed,
-                'words_extracted': words_extracted,
-                'error_message': error_message,
-                'timestamp': firestore.SERVER_TIMESTAMP,
-                'date': datetime.utcnow().date().isoformat(),
-                'hour': datetime.utcnow().hour
-            }
-            
-            # Add to document_processing collection
-            self._db.collection('document_processing').add(doc_data)
-            
-            # Update user's document processing stats
-            await self._update_document_stats(user_id, doc_data)
+            # One clock read per batch; every record shares its date and hour
+            now = datetime.utcnow()
+            date_str = now.date().isoformat()
+            hour = now.hour
+            month = _month_key(now.date())
+            ttl_at = now + timedelta(days=RAW_EVENT_RETENTION_DAYS)
+            usage_collections = {}
+            processing_collection = self._collection('document_processing')
+            
+            usage_by_user = defaultdict(list)
+            docs_by_user = defaultdict(list)
+            batch = self._db.batch()
+            for event in events:
+                if isinstance(event, APIUsageEvent):
+                    usage_data = {
+                        'user_id': event.user_id,
+                        'endpoint': event.endpoint,
+                        'method': event.method,
+                        'status_code': event.status_code,
+                        'response_time_ms': event.response_time_ms,
+                        'request_size_bytes': event.request_size_bytes,
+                        'response_size_bytes': event.response_size_bytes,
+                        'error_message': event.error_message,
+                        'timestamp': firestore.SERVER_TIMESTAMP,
+                        'date': date_str,
+                        'hour': hour,
+                        'ttl_at': ttl_at
+                    }
+                    usage_collection = usage_collections.get(event.user_id)
+                    if usage_collection is None:
+                        usage_collection = usage_collections[event.user_id] = (
+                            self._collection('users').document(event.user_id)
+                            .collection('usage_months').document(month)
+                            .collection('api_usage')
+                        )
+                    batch.set(usage_collection.document(), usage_data)
+                    usage_by_user[event.user_id].append(usage_data)
+                else:
+                    doc_data = {
+                        'user_id': event.user_id,
+                        'document_type': event.document_type,
+                        'file_size_bytes': event.file_size_bytes,
+                        'processing_time_ms': event.processing_time_ms,
+                        'output_format': event.output_format,
+                        'success': event.success,
+                        'pages_processed': event.pages_processed,
+                        'words_extracted': event.words_extracted,
+                        'error_message': event.error_message,
+                        'timestamp': firestore.SERVER_TIMESTAMP,
+                        'date': date_str,
+                        'hour': hour
+                    }
+                    batch.set(processing_collection.document(), doc_data)
+                    docs_by_user[event.user_id].append(doc_data)
+            await batch.commit()
+            
+            # Update each user's daily stats once for the whole batch
+            await asyncio.gather(
+                *(self._update_daily_stats(user_id, user_records)
+                  for user_id, user_records in usage_by_user.items()),
+                *(self._update_document_stats(user_id, user_records)
+                  for user_id, user_records in docs_by_user.items())
+            )
             
         except Exception as e:
-            logger.error(f"Failed to track document processing: {str(e)}")
+            logger.error(f"Failed to track analytics batch: {str(e)}")
     
-    async def _update_daily_stats(self, user_id: str, usage_data: Dict[str, Any]) -> None:
-        """Update user's daily statistics."""
+    async def _update_daily_stats(self, user_id: str, usage_records: List[Dict[str, Any]]) -> None:
+        """Add a batch of usage records to the user's daily statistics in one atomic write."""
         try:
-            date_str = usage_data['date']
-            daily_stats_ref = self._db.collection('daily_stats').document(f"{user_id}_{date_str}")
-            
-            # Get existing stats or create new
-            doc = daily_stats_ref.get()
-            if doc.exists:
-                stats = doc.to_dict()
-            else:
-                stats = {
-                    'user_id': user_id,
-                    'date': date_str,
-                    'api_calls': 0,
-                    'total_response_time_ms': 0,
-                    'total_request_bytes': 0,
-                    'total_response_bytes': 0,
-                    'error_count': 0,
-                    'endpoints': {},
-                    'created_at': firestore.SERVER_TIMESTAMP
-                }
-            
-            # Update stats
-            stats['api_calls'] += 1
-            stats['total_response_time_ms'] += usage_data['response_time_ms']
-            stats['total_request_bytes'] += usage_data['request_size_bytes']
-            stats['total_response_bytes'] += usage_data['response_size_bytes']
-            
-            if usage_data['status_code'] >= 400:
-                stats['error_count'] += 1
-            
-            # Track endpoint usage
-            endpoint = usage_data['endpoint']
-            if endpoint not in stats['endpoints']:
-                stats['endpoints'][endpoint] = 0
-            stats['endpoints'][endpoint] += 1
-            
-            stats['updated_at'] = firestore.SERVER_TIMESTAMP
-            
-            # Save updated stats
-            daily_stats_ref.set(stats)
+            date_str = usage_records[0]['date']
+            # Sum the batch locally, then apply it as server-side increments
+            total_response_time_ms = 0.0
+            total_request_bytes = 0
+            total_response_bytes = 0
+            error_count = 0
+            endpoints: Dict[str, int] = {}
+            for usage_data in usage_records:
+                total_response_time_ms += usage_data['response_time_ms']
+                total_request_bytes += usage_data['request_size_bytes']
+                total_response_bytes += usage_data['response_size_bytes']
+                if usage_data['status_code'] >= 400:
+                    error_count += 1
+                endpoint = usage_data['endpoint']
+                endpoints[endpoint] = endpoints.get(endpoint, 0) + 1
+            
+            await self._write_rollups(API_USAGE_ROLLUPS, user_id, date_str, {
+                'api_calls': firestore.Increment(len(usage_records)),
+                'total_response_time_ms': firestore.Increment(total_response_time_ms),
+                'total_request_bytes': firestore.Increment(total_request_bytes),
+                'total_response_bytes': firestore.Increment(total_response_bytes),
+                'error_count': firestore.Increment(error_count),
+                'endpoints': {
+                    endpoint: firestore.Increment(count)
+                    for endpoint, count in endpoints.items()
+                },
+                'updated_at': firestore.SERVER_TIMESTAMP
+            })
             
         except Exception as e:
             logger.error(f"Failed to update daily stats: {str(e)}")
     
-    async def _update_document_stats(self, user_id: str, doc_data: Dict[str, Any]) -> None:
-        """Update user's document processing statistics."""
+    async def _update_document_stats(self, user_id: str, doc_records: List[Dict[str, Any]]) -> None:
+        """Add a batch of processing records to the user's document statistics in one atomic write."""
         try:
-            date_str = doc_data['date']
-            doc_stats_ref = self._db.collection('document_stats').document(f"{user_id}_{date_str}")
-            
-            # Get existing stats or create new
-            doc = doc_stats_ref.get()
-            if doc.exists:
-                stats = doc.to_dict()
-            else:
-                stats = {
-                    'user_id': user_id,
-                    'date': date_str,
-                    'documents_processed': 0,
-                    'total_file_size_bytes': 0,
-                    'total_processing_time_ms': 0,
-                    'total_pages_processed': 0,
-                    'total_words_extracted': 0,
-                    'success_count': 0,
-                    'error_count': 0,
-                    'document_types': {},
-                    'output_formats': {},
-                    'created_at': firestore.SERVER_TIMESTAMP
-                }
-            
-            # Update stats
-            stats['documents_processed'] += 1
-            stats['total_file_size_bytes'] += doc_data['file_size_bytes']
-            stats['total_processing_time_ms'] += doc_data['processing_time_ms']
-            stats['total_pages_processed'] += doc_data['pages_processed']
-            stats['total_words_extracted'] += doc_data['words_extracted']
-            
-            if doc_data['success']:
-                stats['success_count'] += 1
-            else:
-                stats['error_count'] += 1
-            
-            # Track document types
-            doc_type = doc_data['document_type']
-            if doc_type not in stats['document_types']:
-                stats['document_types'][doc_type] = 0
-            stats['document_types'][doc_type] += 1
-            
-            # Track output formats
-            output_format = doc_data['output_format']
-            if output_format not in stats['output_formats']:
-                stats['output_formats'][output_format] = 0
-            stats['output_formats'][output_format] += 1
-            
-            stats['updated_at'] = firestore.SERVER_TIMESTAMP
-            
-            # Save updated stats
-            doc_stats_ref.set(stats)
+            date_str = doc_records[0]['date']
+            # Sum the batch locally, then apply it as server-side increments
+            total_file_size_bytes = 0
+            total_processing_time_ms = 0.0
+            total_pages_processed = 0
+            total_words_extracted = 0
+            success_count = 0
+            document_types: Dict[str, int] = {}
+            output_formats: Dict[str, int] = {}
+            for doc_data in doc_records:
+                total_file_size_bytes += doc_data['file_size_bytes']
+                total_processing_time_ms += doc_data['processing_time_ms']
+                total_pages_processed += doc_data['pages_processed']
+                total_words_extracted += doc_data['words_extracted']
+                if doc_data['success']:
+                    success_count += 1
+                doc_type = doc_data['document_type']
+                document_types[doc_type] = document_types.get(doc_type, 0) + 1
+                output_format = doc_data['output_format']
+                output_formats[output_format] = output_formats.get(output_format, 0) + 1
+            
+            await self._write_rollups(DOCUMENT_ROLLUPS, user_id, date_str, {
+                'documents_processed': firestore.Increment(len(doc_records)),
+                'total_file_size_bytes': firestore.Increment(total_file_size_bytes),
+                'total_processing_time_ms': firestore.Increment(total_processing_time_ms),
+                'total_pages_processed': firestore.Increment(total_pages_processed),
+                'total_words_extracted': firestore.Increment(total_words_extracted),
+                'success_count': firestore.Increment(success_count),
+                'error_count': firestore.Increment(len(doc_records) - success_count),
+                'document_types': {
+                    doc_type: firestore.Increment(count)
+                    for doc_type, count in document_types.items()
+                },
+                'output_formats': {
+                    output_format: firestore.Increment(count)
+                    for output_format, count in output_formats.items()
+                },
+                'updated_at': firestore.SERVER_TIMESTAMP
+            })
             
         except Exception as e:
             logger.error(f"Failed to update document stats: {str(e)}")
     
+    async def _write_rollups(
+        self,
+        rollups: Tuple[str, str, str],
+        user_id: str,
+        date_str: str,
+        increments: Dict[str, Any]
+    ) -> None:
+        """Apply the same increments to the daily, weekly and monthly documents in one commit."""
+        daily, weekly, monthly = rollups
+        day = date.fromisoformat(date_str)
+        batch = self._db.batch()
+        batch.set(
+            self._collection(daily).document(f"{user_id}_{date_str}"),
+            {'user_id': user_id, 'date': date_str, 'date_epoch_day': _epoch_day(day), **increments},
+            merge=True
+        )
+        for collection, period in ((weekly, _week_key(day)), (monthly, _month_key(day))):
+            batch.set(
+                self._collection(collection).document(f"{user_id}_{period}"),
+                {'user_id': user_id, 'period': period, **increments},
+                merge=True
+            )
+        await batch.commit()
+    
+    async def _read_rollups(
+        self,
+        rollups: Tuple[str, str, str],
+        user_id: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> List[Dict[str, Any]]:
+        """Fetch the rollup documents covering a date range in a single batched read."""
+        daily, weekly, monthly = rollups
+        months, weeks, days = _rollup_periods(start_date.date(), end_date.date())
+        refs = (
+            [self._collection(monthly).document(f"{user_id}_{_month_key(d)}") for d in months] +
+            [self._collection(weekly).document(f"{user_id}_{_week_key(d)}") for d in weeks] +
+            [self._collection(daily).document(f"{user_id}_{d.isoformat()}") for d in days]
+        )
+        return [doc.to_dict() async for doc in self._db.get_all(refs) if doc.exists]
+    
     async def get_user_analytics(
         self, 
         user_id: str, 
@@ -245,20 +378,20 @@ class AnalyticsService:
             raise FirebaseError("Analytics service not available")
         
         try:
+            now = datetime.utcnow()
+            
             # Default to last 30 days if no date range specified
             if not end_date:
-                end_date = datetime.utcnow()
+                end_date = now
             if not start_date:
                 start_date = end_date - timedelta(days=30)
             
-            # Get API usage stats
-            api_stats = await self._get_api_usage_stats(user_id, start_date, end_date)
-            
-            # Get document processing stats
-            doc_stats = await self._get_document_processing_stats(user_id, start_date, end_date)
-            
-            # Get usage trends
-            usage_trends = await self._get_usage_trends(user_id, start_date, end_date)
+            # Fetch API usage, document processing and trends concurrently
+            api_stats, doc_stats, usage_trends = await asyncio.gather(
+                self._get_api_usage_stats(user_id, start_date, end_date),
+                self._get_document_processing_stats(user_id, start_date, end_date),
+                self._get_usage_trends(user_id, start_date, end_date)
+            )
             
             return UserAnalytics(
                 user_id=user_id,
@@ -267,7 +400,7 @@ class AnalyticsService:
                 api_usage=api_stats,
                 document_processing=doc_stats,
                 usage_trends=usage_trends,
-                generated_at=datetime.utcnow()
+                generated_at=now
             )
             
         except Exception as e:
@@ -282,48 +415,28 @@ class AnalyticsService:
     ) -> APIUsageStats:
         """Get API usage statistics for a user."""
         try:
-            start_date_str = start_date.date().isoformat()
-            end_date_str = end_date.date().isoformat()
-            
-            # Query daily stats
-            daily_stats = []
-            query = self._db.collection('daily_stats').where(
-                'user_id', '==', user_id
-            ).where(
-                'date', '>=', start_date_str
-            ).where(
-                'date', '<=', end_date_str
-            )
+            # Read monthly/weekly rollups plus the leftover days
+            daily_stats = await self._read_rollups(API_USAGE_ROLLUPS, user_id, start_date, end_date)
             
-            docs = query.stream()
-            for doc in docs:
-                daily_stats.append(doc.to_dict())
-            
-            # Aggregate stats
-            total_calls = sum(stat.get('api_calls', 0) for stat in daily_stats)
-            total_response_time = sum(stat.get('total_response_time_ms', 0) for stat in daily_stats)
-            total_errors = sum(stat.get('error_count', 0) for stat in daily_stats)
-            total_data_transfer = sum(
-                stat.get('total_request_bytes', 0) + stat.get('total_response_bytes', 0)
-                for stat in daily_stats
-            )
+            # Aggregate stats in a single pass
+            total_calls = total_errors = total_data_transfer = 0
+            total_response_time = 0.0
+            for stat in daily_stats:
+                total_calls += stat.get('api_calls', 0)
+                total_response_time += stat.get('total_response_time_ms', 0)
+                total_errors += stat.get('error_count', 0)
+                total_data_transfer += (
+                    stat.get('total_request_bytes', 0) + stat.get('total_response_bytes', 0)
+                )
             
             # Calculate average response time
             avg_response_time = (total_response_time / total_calls) if total_calls > 0 else 0
             
             # Get most used endpoints
-            endpoint_usage = defaultdict(int)
+            endpoint_usage = Counter()
             for stat in daily_stats:
-                endpoints = stat.get('endpoints', {})
-                for endpoint, count in endpoints.items():
-                    endpoint_usage[endpoint] += count
-            
-            # Sort endpoints by usage
-            top_endpoints = sorted(
-                endpoint_usage.items(), 
-                key=lambda x: x[1], 
-                reverse=True
-            )[:10]
+                endpoint_usage.update(stat.get('endpoints', {}))
+            top_endpoints = endpoint_usage.most_common(10)
             
             return APIUsageStats(
                 total_calls=total_calls,
@@ -346,30 +459,19 @@ class AnalyticsService:
     ) -> DocumentProcessingStats:
         """Get document processing statistics for a user."""
         try:
-            start_date_str = start_date.date().isoformat()
-            end_date_str = end_date.date().isoformat()
-            
-            # Query document stats
-            doc_stats = []
-            query = self._db.collection('document_stats').where(
-                'user_id', '==', user_id
-            ).where(
-                'date', '>=', start_date_str
-            ).where(
-                'date', '<=', end_date_str
-            )
+            # Read monthly/weekly rollups plus the leftover days
+            doc_stats = await self._read_rollups(DOCUMENT_ROLLUPS, user_id, start_date, end_date)
             
-            docs = query.stream()
-            for doc in docs:
-                doc_stats.append(doc.to_dict())
-            
-            # Aggregate stats
-            total_documents = sum(stat.get('documents_processed', 0) for stat in doc_stats)
-            total_file_size = sum(stat.get('total_file_size_bytes', 0) for stat in doc_stats)
-            total_pages = sum(stat.get('total_pages_processed', 0) for stat in doc_stats)
-            total_words = sum(stat.get('total_words_extracted', 0) for stat in doc_stats)
-            success_count = sum(stat.get('success_count', 0) for stat in doc_stats)
-            total_processing_time = sum(stat.get('total_processing_time_ms', 0) for stat in doc_stats)
+            # Aggregate stats in a single pass
+            total_documents = total_file_size = total_pages = total_words = success_count = 0
+            total_processing_time = 0.0
+            for stat in doc_stats:
+                total_documents += stat.get('documents_processed', 0)
+                total_file_size += stat.get('total_file_size_bytes', 0)
+                total_pages += stat.get('total_pages_processed', 0)
+                total_words += stat.get('total_words_extracted', 0)
+                success_count += stat.get('success_count', 0)
+                total_processing_time += stat.get('total_processing_time_ms', 0)
             
             # Calculate success rate
             success_rate = (success_count / total_documents * 100) if total_documents > 0 else 0
@@ -377,19 +479,12 @@ class AnalyticsService:
             # Calculate average processing time
             avg_processing_time = (total_processing_time / total_documents) if total_documents > 0 else 0
             
-            # Get document type distribution
-            doc_type_distribution = defaultdict(int)
+            # Get document type and output format distributions
+            doc_type_distribution = Counter()
+            format_distribution = Counter()
             for stat in doc_stats:
-                doc_types = stat.get('document_types', {})
-                for doc_type, count in doc_types.items():
-                    doc_type_distribution[doc_type] += count
-            
-            # Get output format distribution
-            format_distribution = defaultdict(int)
-            for stat in doc_stats:
-                formats = stat.get('output_formats', {})
-                for format_type, count in formats.items():
-                    format_distribution[format_type] += count
+                doc_type_distribution.update(stat.get('document_types', {}))
+                format_distribution.update(stat.get('output_formats', {}))
             
             return DocumentProcessingStats(
                 total_documents=total_documents,
@@ -414,29 +509,37 @@ class AnalyticsService:
     ) -> List[UsageTrend]:
         """Get usage trends over time for a user."""
         try:
+            start_day = _epoch_day(start_date.date())
+            end_day = _epoch_day(end_date.date())
+            
+            # One range query per collection instead of a get() per day
+            api_calls_by_date = {}
+            documents_by_date = {}
+            for collection, field, by_date in (
+                ('daily_stats', 'api_calls', api_calls_by_date),
+                ('document_stats', 'documents_processed', documents_by_date)
+            ):
+                query = self._collection(collection).where(
+                    'user_id', '==', user_id
+                ).where(
+                    'date_epoch_day', '>=', start_day
+                ).where(
+                    'date_epoch_day', '<=', end_day
+                )
+                async for doc in query.stream():
+                    stat = doc.to_dict()
+                    by_date[stat['date']] = stat.get(field, 0)
+            
             trends = []
             current_date = start_date.date()
             end_date_only = end_date.date()
             
             while current_date <= end_date_only:
                 date_str = current_date.isoformat()
-                
-                # Get daily API stats
-                api_doc = self._db.collection('daily_stats').document(f"{user_id}_{date_str}").get()
-                api_calls = 0
-                if api_doc.exists:
-                    api_calls = api_doc.to_dict().get('api_calls', 0)
-                
-                # Get daily document stats
-                doc_doc = self._db.collection('document_stats').document(f"{user_id}_{date_str}").get()
-                documents_processed = 0
-                if doc_doc.exists:
-                    documents_processed = doc_doc.to_dict().get('documents_processed', 0)
-                
                 trend = UsageTrend(
                     date=current_date,
-                    api_calls=api_calls,
-                    documents_processed=documents_processed,
+                    api_calls=api_calls_by_date.get(date_str, 0),
+                    documents_processed=documents_by_date.get(date_str, 0),
                     data_transfer_bytes=0  # Can be added if needed
                 )
                 trends.append(trend)
@@ -458,25 +561,11 @@ class AnalyticsService:
             # Get analytics for different time periods
             now = datetime.utcnow()
             
-            # Last 7 days
-            week_analytics = await self.get_user_analytics(
-                user_id, 
-                start_date=now - timedelta(days=7),
-                end_date=now
-            )
-            
-            # Last 30 days
-            month_analytics = await self.get_user_analytics(
-                user_id,
-                start_date=now - timedelta(days=30),
-                end_date=now
-            )
-            
-            # Last 90 days
-            quarter_analytics = await self.get_user_analytics(
-                user_id,
-                start_date=now - timedelta(days=90),
-                end_date=now
+            # Last 7, 30 and 90 days, fetched concurrently
+            week_analytics, month_analytics, quarter_analytics = await asyncio.gather(
+                self.get_user_analytics(user_id, start_date=now - timedelta(days=7), end_date=now),
+                self.get_user_analytics(user_id, start_date=now - timedelta(days=30), end_date=now),
+                self.get_user_analytics(user_id, start_date=now - timedelta(days=90), end_date=now)
             )
             
             return AnalyticsDashboard(
@@ -497,14 +586,15 @@ class AnalyticsService:
             return {}
         
         try:
-            today = datetime.utcnow().date().isoformat()
+            now = datetime.utcnow()
+            today = now.date().isoformat()
             
-            # Get today's API stats
-            api_doc = self._db.collection('daily_stats').document(f"{user_id}_{today}").get()
+            # Get today's API and document stats
+            api_doc, doc_doc = await asyncio.gather(
+                self._collection('daily_stats').document(f"{user_id}_{today}").get(),
+                self._collection('document_stats').document(f"{user_id}_{today}").get()
+            )
             api_stats = api_doc.to_dict() if api_doc.exists else {}
-            
-            # Get today's document stats
-            doc_doc = self._db.collection('document_stats').document(f"{user_id}_{today}").get()
             doc_stats = doc_doc.to_dict() if doc_doc.exists else {}
             
             return {
@@ -517,7 +607,7 @@ class AnalyticsService:
                         api_stats.get('total_response_bytes', 0)
                     ) / (1024 * 1024)
                 },
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': now.isoformat()
             }
             
         except Exception as e:
@@ -526,12 +616,7 @@ class AnalyticsService:
 
 
 # Global instance
-_analytics_service: Optional[AnalyticsService] = None
-
-
+@lru_cache(maxsize=1)
 def get_analytics_service() -> AnalyticsService:
-    """Get Analytics service instance."""
-    global _analytics_service
-    if _analytics_service is None:
-        _analytics_service = AnalyticsService()
-    return _analytics_service
+    """Get cached AnalyticsService instance."""
+    return AnalyticsService()
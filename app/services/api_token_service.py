@@ -1,10 +1,14 @@
 """API Token Management Service."""
 
 import hashlib
+import hmac
 import secrets
 import logging
-from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+import threading
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional
 
 import jwt
 from jwt.exceptions import PyJWTError
@@ -16,11 +20,25 @@ from ..utils.db import get_connection
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Marks a bearer token as an API token (Firebase ID tokens are JWTs)
+TOKEN_PREFIX = "dnlp_"
+# Separates the token ID hint from the secret; never produced by token_urlsafe
+TOKEN_ID_SEPARATOR = "."
+# Pending last_used stamps are written together at most this often (seconds)
+LAST_USED_FLUSH_INTERVAL = 5.0
+SECONDS_PER_DAY = 86_400
+# Expired tokens deleted per cleanup transaction
+CLEANUP_BATCH_SIZE = 1000
+
 
 class APITokenService:
     """Service for managing API tokens."""
     
     def __init__(self):
+        # verify_token_sync runs in worker threads; guards the two fields below
+        self._last_used_lock = threading.Lock()
+        self._pending_last_used: Dict[str, int] = {}
+        self._last_used_flushed_at = time.monotonic()
         self._init_token_tables()
     
     def _init_token_tables(self):
@@ -33,21 +51,60 @@ class APITokenService:
                     user_id TEXT NOT NULL,
                     token_name TEXT NOT NULL,
                     token_hash TEXT NOT NULL,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    expires_at DATETIME NOT NULL,
-                    last_used DATETIME,
+                    created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+                    expires_at INTEGER NOT NULL,
+                    last_used INTEGER,
                     is_active BOOLEAN DEFAULT 1
                 )
             """)
+            # Timestamps are epoch seconds; convert rows stored as ISO strings
+            for column in ("created_at", "expires_at", "last_used"):
+                cursor.execute(f"""
+                    UPDATE api_tokens 
+                    SET {column} = CAST(strftime('%s', {column}) AS INTEGER)
+                    WHERE typeof({column}) = 'text'
+                """)
+            # Legacy hash lookups, per-user listings and expired-token cleanup
+            cursor.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_api_tokens_hash
+                ON api_tokens(token_hash)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_api_tokens_user_created
+                ON api_tokens(user_id, created_at DESC)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_api_tokens_expiry
+                ON api_tokens(expires_at) WHERE is_active = 0
+            """)
             conn.commit()
     
-    def _generate_token(self) -> tuple:
+    def _generate_token(self, token_id: str) -> tuple:
         """Generate a new API token and its hash."""
-        # Generate a secure random token
-        token = secrets.token_urlsafe(32)
+        # Generate a secure random token, prefixed with its ID so
+        # verification can look the row up by primary key
+        token = f"{TOKEN_PREFIX}{token_id}{TOKEN_ID_SEPARATOR}{secrets.token_urlsafe(32)}"
         # Create hash for storage
-        token_hash = hashlib.sha256(token.encode()).hexdigest()
+        token_hash = self._hash_token(token)
         return token, token_hash
+
+    @staticmethod
+    def _hash_token(token: str) -> str:
+        """Hash a token for storage and lookup.
+
+        Tokens are 256-bit random values, so a single fast digest is enough;
+        a slow password KDF would only add latency to every verification.
+        SHA-256 stays: for ~70-byte tokens it is as fast as BLAKE2b and
+        faster than the blake3 package, whose call overhead dominates.
+        """
+        return hashlib.sha256(token.encode()).hexdigest()
+    
+    @staticmethod
+    def _to_iso(epoch_seconds: Optional[int]) -> Optional[str]:
+        """Format a stored epoch timestamp as an ISO 8601 UTC string."""
+        if epoch_seconds is None:
+            return None
+        return datetime.fromtimestamp(epoch_seconds, timezone.utc).isoformat()
     
     def _generate_token_id(self) -> str:
         """Generate a unique token ID."""
@@ -56,19 +113,25 @@ class APITokenService:
     async def create_token(self, user_id: str, token_data: APITokenCreate) -> APITokenResponse:
         """Create a new API token for a user."""
         # Check if user has reached token limit
-        existing_tokens = await self.get_user_tokens(user_id)
-        active_tokens = [t for t in existing_tokens if t.is_active]
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COUNT(*) 
+                FROM api_tokens 
+                WHERE user_id = ? AND is_active = 1
+            """, (user_id,))
+            (active_count,) = cursor.fetchone()
         
-        if len(active_tokens) >= settings.max_api_tokens_per_user:
+        if active_count >= settings.max_api_tokens_per_user:
             raise ValueError(f"Maximum number of API tokens ({settings.max_api_tokens_per_user}) reached")
         
         # Generate token and metadata
         token_id = self._generate_token_id()
-        api_token, token_hash = self._generate_token()
+        api_token, token_hash = self._generate_token(token_id)
         
         expires_in_days = token_data.expires_in_days or settings.api_token_expiry_days
-        created_at = datetime.now(timezone.utc)
-        expires_at = created_at + timedelta(days=expires_in_days)
+        created_at = int(time.time())
+        expires_at = created_at + expires_in_days * SECONDS_PER_DAY
         
         # Store in database
         with get_connection() as conn:
@@ -82,8 +145,8 @@ class APITokenService:
                 user_id,
                 token_data.token_name,
                 token_hash,
-                created_at.isoformat(),
-                expires_at.isoformat(),
+                created_at,
+                expires_at,
                 True
             ))
             conn.commit()
@@ -92,39 +155,51 @@ class APITokenService:
             token_id=token_id,
             token_name=token_data.token_name,
             api_token=api_token,
-            created_at=created_at.isoformat(),
-            expires_at=expires_at.isoformat()
+            created_at=self._to_iso(created_at),
+            expires_at=self._to_iso(expires_at)
         )
     
     async def verify_token(self, token: str) -> Optional[str]:
         """Verify an API token and return the associated user ID."""
-        token_hash = hashlib.sha256(token.encode()).hexdigest()
+        return self.verify_token_sync(token)
+    
+    def verify_token_sync(self, token: str) -> Optional[str]:
+        """Synchronous core of verify_token, usable from sync key functions."""
+        token_hash = self._hash_token(token)
+        
+        body = token[len(TOKEN_PREFIX):] if token.startswith(TOKEN_PREFIX) else token
+        token_id, separator, _ = body.partition(TOKEN_ID_SEPARATOR)
         
         with get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT user_id, expires_at, is_active, token_id
-                FROM api_tokens 
-                WHERE token_hash = ?
-            """, (token_hash,))
+            if separator:
+                # Token carries its ID: primary-key lookup, then compare hashes
+                cursor.execute("""
+                    SELECT user_id, expires_at, is_active, token_id, token_hash
+                    FROM api_tokens 
+                    WHERE token_id = ?
+                """, (token_id,))
+            else:
+                # Tokens issued before IDs were embedded
+                cursor.execute("""
+                    SELECT user_id, expires_at, is_active, token_id, token_hash
+                    FROM api_tokens 
+                    WHERE token_hash = ?
+                """, (token_hash,))
             
             row = cursor.fetchone()
-            if not row:
+            if not row or not hmac.compare_digest(row[4], token_hash):
                 return None
             
-            user_id, expires_at_str, is_active, token_id = row
+            user_id, expires_at, is_active, token_id, _ = row
             
             # Check if token is active
             if not is_active:
                 return None
             
             # Check if token is expired
-            try:
-                expires_at = datetime.fromisoformat(expires_at_str.replace('Z', '+00:00'))
-            except ValueError:
-                expires_at = datetime.fromisoformat(expires_at_str).replace(tzinfo=timezone.utc)
-            
-            if datetime.now(timezone.utc) > expires_at:
+            now = int(time.time())
+            if now > expires_at:
                 # Mark token as inactive
                 cursor.execute("""
                     UPDATE api_tokens 
@@ -134,15 +209,35 @@ class APITokenService:
                 conn.commit()
                 return None
             
-            # Update last used timestamp
-            cursor.execute("""
+            # Record last use; stamps are written in batches
+            with self._last_used_lock:
+                self._pending_last_used[token_id] = now
+                flush = time.monotonic() - self._last_used_flushed_at >= LAST_USED_FLUSH_INTERVAL
+            if flush:
+                self._write_last_used(cursor)
+                conn.commit()
+            
+            return user_id
+    
+    def _write_last_used(self, cursor) -> None:
+        """Write every pending last_used stamp in one executemany."""
+        with self._last_used_lock:
+            pending, self._pending_last_used = self._pending_last_used, {}
+            self._last_used_flushed_at = time.monotonic()
+        if pending:
+            cursor.executemany("""
                 UPDATE api_tokens 
                 SET last_used = ? 
                 WHERE token_id = ?
-            """, (datetime.now(timezone.utc).isoformat(), token_id))
+            """, [(last_used, token_id) for token_id, last_used in pending.items()])
+    
+    def flush_last_used(self) -> None:
+        """Write pending last_used stamps now, e.g. on shutdown."""
+        if not self._pending_last_used:
+            return
+        with get_connection() as conn:
+            self._write_last_used(conn.cursor())
             conn.commit()
-            
-            return user_id
     
     async def get_user_tokens(self, user_id: str) -> List[APITokenInfo]:
         """Get all tokens for a user."""
@@ -161,9 +256,9 @@ class APITokenService:
                 tokens.append(APITokenInfo(
                     token_id=token_id,
                     token_name=token_name,
-                    created_at=created_at,
-                    expires_at=expires_at,
-                    last_used=last_used,
+                    created_at=self._to_iso(created_at),
+                    expires_at=self._to_iso(expires_at),
+                    last_used=self._to_iso(last_used),
                     is_active=bool(is_active)
                 ))
             
@@ -197,26 +292,36 @@ class APITokenService:
     
     async def cleanup_expired_tokens(self) -> int:
         """Clean up expired tokens from the database."""
-        current_time = datetime.now(timezone.utc).isoformat()
+        current_time = int(time.time())
+        deleted = 0
         
         with get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                DELETE FROM api_tokens 
-                WHERE expires_at < ? AND is_active = 0
-            """, (current_time,))
-            conn.commit()
+            # Delete in short transactions so verifications can interleave
+            while True:
+                cursor.execute("""
+                    DELETE FROM api_tokens 
+                    WHERE token_id IN (
+                        SELECT token_id FROM api_tokens 
+                        WHERE expires_at < ? AND is_active = 0 
+                        LIMIT ?
+                    )
+                """, (current_time, CLEANUP_BATCH_SIZE))
+                conn.commit()
+                deleted += cursor.rowcount
+                if cursor.rowcount < CLEANUP_BATCH_SIZE:
+                    break
             
-            return cursor.rowcount
+            if deleted:
+                # Return freed pages to the OS (no-op unless auto_vacuum=INCREMENTAL)
+                cursor.execute("PRAGMA incremental_vacuum")
+                cursor.fetchall()
+            
+            return deleted
 
 
 # Global instance
-_api_token_service: Optional[APITokenService] = None
-
-
+@lru_cache(maxsize=1)
 def get_api_token_service() -> APITokenService:
-    """Get API token service instance."""
-    global _api_token_service
-    if _api_token_service is None:
-        _api_token_service = APITokenService()
-    return _api_token_service
+    """Get cached APITokenService instance."""
+    return APITokenService()
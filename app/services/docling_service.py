@@ -1,15 +1,25 @@
-from functools import lru_cache
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from functools import cached_property, lru_cache
 from pathlib import Path
 from re import match
-from typing import Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any, Set, Tuple, Union
+from collections import Counter
+import asyncio
+import multiprocessing
 import time
-import json
 import os
+import re
+import sys
+import anyio
+import orjson
+from docling.datamodel.base_models import DocumentStream, InputFormat
 from docling.document_converter import DocumentConverter
 
 from ..core.config.config import get_settings
 from ..core.exceptions import DocumentProcessingError, DocumentConversionError
-from ..models.enums import OutputFormat
+from ..models.enums import MetadataLevel, OutputFormat
 from ..models.schemas import ProcessingResponse, ProcessingStatus
 from ..utils.logger import setup_logger
 from ..middleware.analytics_middleware import get_document_tracker
@@ -17,57 +27,241 @@ from ..middleware.analytics_middleware import get_document_tracker
 settings = get_settings()
 logger = setup_logger(__name__, settings.log_level)
 
+# Paragraphs are separated by blank lines; sentences end in . ! or ?
+_PARA_SPLIT = re.compile(r'\n{2,}')
+_SENT_SPLIT = re.compile(r'[.!?]+')
+
+# Keyword extraction: words of three or more letters; keywords need four or
+# more, so only longer stop words are listed
+_WORD_RE = re.compile(r'\b[a-zA-Z]{3,}\b')
+_STOP_WORDS = frozenset({
+    'with', 'from', 'about', 'into', 'through', 'during', 'before', 'after',
+    'above', 'below', 'between', 'among', 'under', 'over', 'within', 'without',
+    'along', 'following', 'across', 'throughout', 'upon', 'around', 'beyond',
+    'near', 'since', 'until', 'toward', 'towards', 'against', 'concerning',
+    'regarding', 'according', 'including', 'excluding', 'except', 'besides',
+    'unlike', 'despite'
+})
+
+# Formats rendered without the dict export; full metadata would add one
+_BASIC_METADATA_FORMATS = frozenset({OutputFormat.TEXT, OutputFormat.MARKDOWN, OutputFormat.HTML})
+
+# One converter per process, shared by every DoclingService
+_converter: Optional[DocumentConverter] = None
+
+
+def get_converter() -> DocumentConverter:
+    """Return the process-wide DocumentConverter, creating it on first use."""
+    global _converter
+    if _converter is None:
+        logger.info("Initializing DocumentConverter...")
+        _converter = DocumentConverter()
+        logger.info("DocumentConverter initialized successfully")
+    return _converter
+
+
+def _warm_converter() -> None:
+    """Build the converter and load the PDF pipeline's models.
+
+    The layout, table and OCR models otherwise load lazily inside the
+    first PDF conversion. Blocking; run it off the event loop.
+    """
+    converter = get_converter()
+    if not settings.docling_warmup:
+        return
+    try:
+        start_time = time.perf_counter()
+        converter.initialize_pipeline(InputFormat.PDF)
+        logger.info(
+            f"PDF pipeline warmed up in {time.perf_counter() - start_time:.2f}s")
+    except Exception as e:
+        logger.warning(f"Docling warm-up failed, models will load on first use: {e}")
+
+
+# Conversion processes when settings.docling_workers > 0; each worker
+# holds its own converter, built by the pool initializer
+_executor: Optional[ProcessPoolExecutor] = None
+# Conversions not yet finished; Python 3.8's shutdown() can't cancel queued work
+_conversions: Set[Future] = set()
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _convert_worker(
+    source: Union[str, DocumentStream],
+    output_format: OutputFormat,
+    metadata_level: MetadataLevel
+) -> Tuple[str, Dict[str, Any]]:
+    """Convert and render a document inside a pool process.
+
+    Only the rendered content and metadata are sent back, not the document.
+    """
+    return DoclingService._convert_and_render(source, output_format, metadata_level)
+
+
+def _submit_conversion(
+    executor: ProcessPoolExecutor,
+    source: Union[str, DocumentStream],
+    output_format: OutputFormat,
+    metadata_level: MetadataLevel
+) -> "asyncio.Future[Tuple[str, Dict[str, Any]]]":
+    """Queue a conversion on the pool and track it until it finishes."""
+    future = executor.submit(_convert_worker, source, output_format, metadata_level)
+    _conversions.add(future)
+    future.add_done_callback(_conversions.discard)
+    return asyncio.wrap_future(future)
+
+
+async def start_docling_workers() -> None:
+    """Prepare document conversion before the first upload.
+
+    With docling_workers set, start that many conversion processes and wait
+    for each to load its models; otherwise warm the in-process converter.
+    """
+    global _executor
+    if settings.docling_workers <= 0:
+        await anyio.to_thread.run_sync(_warm_converter)
+        return
+
+    # spawn, not fork: the parent may already hold model and thread state
+    _executor = ProcessPoolExecutor(
+        max_workers=settings.docling_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_warm_converter,
+    )
+    loop = asyncio.get_running_loop()
+    pids = await asyncio.gather(*(
+        loop.run_in_executor(_executor, _worker_ready)
+        for _ in range(settings.docling_workers)
+    ))
+    logger.info(f"Started {len(set(pids))} document conversion processes")
+
+
+async def stop_docling_workers() -> None:
+    """Shut the conversion processes down, if any were started."""
+    global _executor
+    if _executor is None:
+        return
+    executor, _executor = _executor, None
+    if sys.version_info >= (3, 9):
+        await anyio.to_thread.run_sync(lambda: executor.shutdown(cancel_futures=True))
+        return
+
+    # Cancel queued conversions; running ones are left to finish
+    for future in list(_conversions):
+        future.cancel()
+    await anyio.to_thread.run_sync(executor.shutdown)
+
+
+@dataclass
+class _DocCache:
+    """Exports of one converted document, each computed at most once.
+
+    Format conversion, metadata extraction and the NLP JSON all read the
+    same text and dict exports; building them once avoids re-serializing
+    the document tree for every step.
+    """
+    doc: Any
+
+    @cached_property
+    def text(self) -> str:
+        return self.doc.export_to_text()
+
+    @cached_property
+    def dict_(self) -> Dict[str, Any]:
+        return self.doc.export_to_dict()
+
+    @cached_property
+    def word_count(self) -> int:
+        return len(self.text.split()) if self.text else 0
+
+
+def _render_json(cache: _DocCache) -> str:
+    return orjson.dumps(
+        DoclingService._create_nlp_structured_json(cache),
+        option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+
+
+# Renderer per output format, looked up once per document
+_RENDERERS: Dict[OutputFormat, Callable[[_DocCache], str]] = {
+    OutputFormat.MARKDOWN: lambda cache: cache.doc.export_to_markdown(),
+    OutputFormat.HTML: lambda cache: cache.doc.export_to_html(),
+    OutputFormat.TEXT: lambda cache: cache.text,
+    OutputFormat.DOCTAGS: lambda cache: cache.doc.export_to_doctags(),
+    OutputFormat.JSON: _render_json,
+}
+
 
 class DoclingService:
     """Service class for handling Docling operations."""
 
     def __init__(self):
-        self._converter: Optional[DocumentConverter] = None
+        self._doc_tracker = get_document_tracker()
 
     @property
     def converter(self) -> DocumentConverter:
-        """Lazy-loaded DocumentConverter instance."""
-        if self._converter is None:
-            logger.info("Initializing DocumentConverter...")
-            self._converter = DocumentConverter()
-            logger.info("DocumentConverter initialized successfully")
-        return self._converter
+        """Process-wide DocumentConverter instance."""
+        return get_converter()
 
     async def process_document(
         self,
         file_path: Path,
         output_format: OutputFormat,
-        use_ocr: bool = False
+        use_ocr: bool = False,
+        metadata_level: Optional[MetadataLevel] = None,
+        file_stat: Optional[os.stat_result] = None
     ) -> ProcessingResponse:
-        """Process document and return in requested format."""
-        start_time = time.time()
+        """Process document and return in requested format.
 
-        try:
-            if not file_path.exists():
-                raise DocumentProcessingError(
-                    f"File does not exist: {file_path}")
+        metadata_level defaults to BASIC for text, markdown and HTML output,
+        which never need the dict export, and FULL otherwise. Callers that
+        already stat'ed file_path can pass the result to skip the existence check.
+        """
+        if file_stat is None and not file_path.exists():
+            return self._failed_response(
+                DocumentProcessingError(f"File does not exist: {file_path}"), time.perf_counter())
 
-            logger.info(f"Processing document: {file_path}")
+        return await self._process(str(file_path), str(file_path), output_format, metadata_level)
 
-            # Convert document
-            try:
-                result = self.converter.convert(str(file_path))
-                doc = result.document
-            except TypeError:
-                # Fallback for older versions
-                result = self.converter.convert_single(str(file_path))
-                doc = result.document
-            except Exception as e:
-                raise DocumentProcessingError(
-                    f"Failed to convert document: {str(e)}")
+    async def process_bytes(
+        self,
+        filename: str,
+        data: bytes,
+        output_format: OutputFormat,
+        use_ocr: bool = False,
+        metadata_level: Optional[MetadataLevel] = None
+    ) -> ProcessingResponse:
+        """Process an in-memory document; filename's extension picks the format."""
+        source = DocumentStream(name=filename, stream=BytesIO(data))
+        return await self._process(source, filename, output_format, metadata_level)
 
-            # Convert to requested format
-            content = self._convert_to_format(doc, output_format)
+    async def _process(
+        self,
+        source: Union[str, DocumentStream],
+        label: str,
+        output_format: OutputFormat,
+        metadata_level: Optional[MetadataLevel]
+    ) -> ProcessingResponse:
+        """Convert source off the event loop and wrap the result."""
+        start_time = time.perf_counter()
+        if metadata_level is None:
+            metadata_level = (MetadataLevel.BASIC if output_format in _BASIC_METADATA_FORMATS
+                              else MetadataLevel.FULL)
 
-            # Extract metadata
-            metadata = self._extract_metadata(doc)
+        try:
+            logger.info(f"Processing document: {label}")
 
-            processing_time = time.time() - start_time
+            # Convert and render off the event loop
+            if _executor is not None:
+                content, metadata = await _submit_conversion(
+                    _executor, source, output_format, metadata_level)
+            else:
+                content, metadata = await anyio.to_thread.run_sync(
+                    self._convert_and_render, source, output_format, metadata_level)
+
+            processing_time = time.perf_counter() - start_time
 
             logger.info(
                 f"Document processed successfully in {processing_time:.2f}s")
@@ -80,15 +274,19 @@ class DoclingService:
             )
 
         except Exception as e:
-            processing_time = time.time() - start_time
-            logger.error(
-                f"Document processing failed after {processing_time:.2f}s: {str(e)}")
+            return self._failed_response(e, start_time)
 
-            return ProcessingResponse(
-                status=ProcessingStatus.FAILED,
-                metadata={"error": str(e)},
-                processing_time=processing_time
-            )
+    @staticmethod
+    def _failed_response(error: Exception, start_time: float) -> ProcessingResponse:
+        processing_time = time.perf_counter() - start_time
+        logger.error(
+            f"Document processing failed after {processing_time:.2f}s: {str(error)}")
+
+        return ProcessingResponse(
+            status=ProcessingStatus.FAILED,
+            metadata={"error": str(error)},
+            processing_time=processing_time
+        )
 
     async def process_document_with_analytics(
         self,
@@ -98,7 +296,7 @@ class DoclingService:
         use_ocr: bool = False
     ) -> ProcessingResponse:
         """Process document with analytics tracking."""
-        start_time = time.time()
+        start_time = time.perf_counter()
         file_size = 0
         document_type = "unknown"
         success = False
@@ -107,13 +305,18 @@ class DoclingService:
         error_message = None
 
         try:
-            # Get file information
-            if file_path.exists():
-                file_size = os.path.getsize(file_path)
+            # Get file information with a single stat
+            try:
+                file_stat = os.stat(file_path)
+            except FileNotFoundError:
+                file_stat = None
+            else:
+                file_size = file_stat.st_size
                 document_type = file_path.suffix.lower().lstrip('.')
 
             # Process the document
-            response = await self.process_document(file_path, output_format, use_ocr)
+            response = await self.process_document(
+                file_path, output_format, use_ocr, file_stat=file_stat)
             
             # Extract analytics data from response
             if response.status == ProcessingStatus.COMPLETED:
@@ -124,11 +327,10 @@ class DoclingService:
             else:
                 error_message = response.metadata.get('error', 'Unknown error') if response.metadata else 'Unknown error'
 
-            processing_time_ms = (time.time() - start_time) * 1000
+            processing_time_ms = (time.perf_counter() - start_time) * 1000
 
             # Track analytics asynchronously
-            doc_tracker = get_document_tracker()
-            await doc_tracker.track_document_processing(
+            await self._doc_tracker.track_document_processing(
                 user_id=user_id,
                 document_type=document_type,
                 file_size_bytes=file_size,
@@ -143,13 +345,12 @@ class DoclingService:
             return response
 
         except Exception as e:
-            processing_time_ms = (time.time() - start_time) * 1000
+            processing_time_ms = (time.perf_counter() - start_time) * 1000
             error_message = str(e)
             
             # Track failed processing
             try:
-                doc_tracker = get_document_tracker()
-                await doc_tracker.track_document_processing(
+                await self._doc_tracker.track_document_processing(
                     user_id=user_id,
                     document_type=document_type,
                     file_size_bytes=file_size,
@@ -166,44 +367,90 @@ class DoclingService:
             # Re-raise the original exception
             raise
 
-    def _convert_to_format(self, doc, output_format: OutputFormat) -> str:
+    @classmethod
+    def _convert_and_render(
+        cls,
+        source: Union[str, DocumentStream],
+        output_format: OutputFormat,
+        metadata_level: MetadataLevel = MetadataLevel.FULL
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Convert a file path or stream and return its content in output_format plus metadata.
+
+        Blocking; runs in a worker thread or a conversion process.
+        """
+        converter = get_converter()
+        try:
+            result = converter.convert(source)
+            doc = result.document
+        except TypeError:
+            # Fallback for older versions
+            result = converter.convert_single(source)
+            doc = result.document
+        except Exception as e:
+            raise DocumentProcessingError(
+                f"Failed to convert document: {str(e)}")
+
+        cache = _DocCache(doc)
+
+        # Convert to requested format
+        content = cls._convert_to_format(cache, output_format)
+
+        # Extract metadata
+        if metadata_level == MetadataLevel.NONE:
+            metadata = {}
+        elif metadata_level == MetadataLevel.BASIC:
+            metadata = cls._extract_basic_metadata(cache)
+        else:
+            metadata = cls._extract_metadata(cache)
+        return content, metadata
+
+    @staticmethod
+    def _convert_to_format(cache: _DocCache, output_format: OutputFormat) -> str:
         """Convert DoclingDocument to desired output format."""
         try:
-            match output_format:
-                case OutputFormat.MARKDOWN:
-                    return doc.export_to_markdown()
-                case OutputFormat.HTML:
-                    return doc.export_to_html()
-                case OutputFormat.TEXT:
-                    return doc.export_to_text()
-                case OutputFormat.DOCTAGS:
-                    return doc.export_to_doctags()
-                case OutputFormat.JSON:
-                    return json.dumps(self._create_nlp_structured_json(doc), indent=2)
-                case _:
-                    raise DocumentConversionError(
-                        f"Unsupported output format: {output_format}")
+            render = _RENDERERS.get(output_format)
+            if render is None:
+                raise DocumentConversionError(
+                    f"Unsupported output format: {output_format}")
+            return render(cache)
 
         except Exception as e:
             raise DocumentConversionError(
                 f"Failed to convert to {output_format}: {str(e)}")
 
-    def _extract_metadata(self, doc) -> Dict[str, Any]:
+    @staticmethod
+    def _extract_basic_metadata(cache: _DocCache) -> Dict[str, Any]:
+        """Extract metadata from document attributes, without any export."""
+        doc = cache.doc
+        try:
+            metadata = {
+                "page_count": len(getattr(doc, 'pages', None) or ()),
+                "has_images": bool(getattr(doc, 'pictures', None)),
+                "has_tables": bool(getattr(doc, 'tables', None)),
+            }
+            # Count words only if the output already exported the text
+            if 'text' in vars(cache):
+                metadata["word_count"] = cache.word_count
+            return metadata
+
+        except Exception as e:
+            logger.warning(f"Failed to extract metadata: {e}")
+            return {}
+
+    @staticmethod
+    def _extract_metadata(cache: _DocCache) -> Dict[str, Any]:
         """Extract metadata from document."""
+        doc = cache.doc
         try:
-            doc_dict = doc.export_to_dict()
+            doc_dict = cache.dict_
 
             # Count pages if available
             page_count = len(doc_dict.get('pages', []))
 
-            # Estimate word count from text
-            text_content = doc.export_to_text()
-            word_count = len(text_content.split()) if text_content else 0
-
             # Extract other metadata
             metadata = {
                 "page_count": page_count,
-                "word_count": word_count,
+                "word_count": cache.word_count,
                 "has_images": bool(doc_dict.get('pictures', [])),
                 "has_tables": bool(doc_dict.get('tables', [])),
             }
@@ -218,17 +465,18 @@ class DoclingService:
             logger.warning(f"Failed to extract metadata: {e}")
             return {}
 
-    def _create_nlp_structured_json(self, doc) -> Dict[str, Any]:
+    @staticmethod
+    def _create_nlp_structured_json(cache: _DocCache) -> Dict[str, Any]:
         """Create a structured JSON format optimized for NLP tasks."""
         try:
-            doc_dict = doc.export_to_dict()
-            text_content = doc.export_to_text()
+            doc_dict = cache.dict_
+            text_content = cache.text
             
             # Extract structured data for NLP processing
             structured_data = {
                 "document_info": {
                     "total_pages": len(doc_dict.get('pages', [])),
-                    "total_words": len(text_content.split()) if text_content else 0,
+                    "total_words": cache.word_count,
                     "total_characters": len(text_content) if text_content else 0,
                     "has_tables": bool(doc_dict.get('tables', [])),
                     "has_images": bool(doc_dict.get('pictures', [])),
@@ -261,26 +509,25 @@ class DoclingService:
                 }
                 
                 # Extract text elements from page
-                if hasattr(page, 'texts') or 'texts' in page:
-                    texts = page.get('texts', []) if isinstance(page, dict) else getattr(page, 'texts', [])
-                    for text_elem in texts:
-                        if isinstance(text_elem, dict):
-                            text_content = text_elem.get('text', '')
-                        else:
-                            text_content = str(text_elem)
-                        
-                        page_data["text"] += text_content + " "
-                        page_data["elements"].append({
-                            "type": "text",
-                            "content": text_content,
-                            "bbox": text_elem.get('bbox', []) if isinstance(text_elem, dict) else []
-                        })
+                if isinstance(page, dict):
+                    texts = page.get('texts', [])
+                else:
+                    texts = getattr(page, 'texts', [])
+                elements = page_data["elements"] = [
+                    {"type": "text", "content": elem.get('text', ''), "bbox": elem.get('bbox', [])}
+                    if isinstance(elem, dict) else
+                    {"type": "text", "content": str(elem), "bbox": []}
+                    for elem in texts
+                ]
+                
+                # Joined once; each element's text is followed by a space
+                page_data["text"] = "".join(f"{elem['content']} " for elem in elements)
                 
                 structured_data["pages"].append(page_data)
             
             # Extract paragraphs by splitting on double newlines
             if text_content:
-                paragraphs = [p.strip() for p in text_content.split('\n\n') if p.strip()]
+                paragraphs = [p for para in _PARA_SPLIT.split(text_content) if (p := para.strip())]
                 structured_data["content"]["paragraphs"] = [
                     {
                         "id": i,
@@ -291,11 +538,10 @@ class DoclingService:
                 ]
                 
                 # Extract sentences (simple split on sentence endings)
-                sentences = []
-                for para in paragraphs:
-                    import re
-                    sent_list = re.split(r'[.!?]+', para)
-                    sentences.extend([s.strip() for s in sent_list if s.strip()])
+                sentences = [
+                    sent for para in paragraphs
+                    for part in _SENT_SPLIT.split(para) if (sent := part.strip())
+                ]
                 
                 structured_data["content"]["sentences"] = [
                     {
@@ -334,20 +580,20 @@ class DoclingService:
             
             # Basic keyword extraction (simple frequency-based)
             if text_content:
-                import re
-                from collections import Counter
-                
-                # Simple keyword extraction
-                words = re.findall(r'\b[a-zA-Z]{3,}\b', text_content.lower())
-                word_freq = Counter(words)
-                
-                # Filter out common stop words
-                stop_words = {'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'from', 'up', 'about', 'into', 'through', 'during', 'before', 'after', 'above', 'below', 'between', 'among', 'under', 'over', 'within', 'without', 'along', 'following', 'across', 'throughout', 'upon', 'around', 'beyond', 'near', 'since', 'until', 'toward', 'towards', 'via', 'against', 'concerning', 'regarding', 'according', 'including', 'excluding', 'except', 'besides', 'unlike', 'despite', 'throughout', 'within'}
+                # Count words as they appear, then fold case over the
+                # (much smaller) vocabulary instead of lowercasing the text
+                word_freq = Counter()
+                for word, freq in Counter(_WORD_RE.findall(text_content)).items():
+                    word_freq[word.lower()] += freq
+                total_words = sum(word_freq.values())
                 
+                candidates = Counter({
+                    word: freq for word, freq in word_freq.items()
+                    if len(word) > 3 and word not in _STOP_WORDS
+                })
                 keywords = [
-                    {"word": word, "frequency": freq, "score": freq / len(words)}
-                    for word, freq in word_freq.most_common(20)
-                    if word not in stop_words and len(word) > 3
+                    {"word": word, "frequency": freq, "score": freq / total_words}
+                    for word, freq in candidates.most_common(20)
                 ]
                 
                 structured_data["content"]["keywords"] = keywords
@@ -364,20 +610,22 @@ class DoclingService:
                     "error": str(e)
                 },
                 "content": {
-                    "full_text": doc.export_to_text() if hasattr(doc, 'export_to_text') else "",
+                    "full_text": cache.text if hasattr(cache.doc, 'export_to_text') else "",
                     "paragraphs": [],
                     "sentences": []
                 },
                 "structure": {
-                    "raw_docling_export": doc.export_to_dict() if hasattr(doc, 'export_to_dict') else {}
+                    "raw_docling_export": cache.dict_ if hasattr(cache.doc, 'export_to_dict') else {}
                 }
             }
     
     def health_check(self) -> bool:
         """Check if DoclingService is healthy."""
         try:
-            # Try to access the converter
-            _ = self.converter
+            # Conversion processes own their converters; otherwise
+            # try to access the in-process one
+            if _executor is None:
+                _ = self.converter
             return True
         except Exception as e:
             logger.error(f"DoclingService health check failed: {e}")
@@ -1,16 +1,21 @@
 """Firebase Authentication Service."""
 
+import hashlib
 import json
 import logging
+import time
 from typing import Optional, Dict, Any
 from datetime import datetime
+from functools import lru_cache
 
+import anyio
 import firebase_admin
 from firebase_admin import auth, credentials
-from firebase_admin.exceptions import FirebaseError
+from firebase_admin.exceptions import INVALID_ARGUMENT, UNAVAILABLE, FirebaseError
 
 from ..core.config.config import get_settings
 from ..models.models import FirebaseUserCreate, FirebaseUserResponse
+from ..utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -21,6 +26,8 @@ class FirebaseService:
     
     def __init__(self):
         self._app = None
+        # Verified ID-token claims, keyed by a digest of the whole token
+        self._verified_tokens = TTLCache(maxsize=50_000, ttl=300)
         self._initialize_firebase()
     
     def _initialize_firebase(self):
@@ -64,7 +71,7 @@ class FirebaseService:
     async def create_user(self, user_data: FirebaseUserCreate) -> FirebaseUserResponse:
         """Create a new Firebase user."""
         if not self.is_available():
-            raise FirebaseError("Firebase not initialized")
+            raise FirebaseError(UNAVAILABLE, "Firebase not initialized")
             
         try:
             user_record = auth.create_user(
@@ -85,18 +92,45 @@ class FirebaseService:
             raise
     
     async def verify_id_token(self, id_token: str) -> Dict[str, Any]:
-        """Verify Firebase ID token and return user info."""
+        """Verify Firebase ID token and return user info.
+
+        Cache misses are verified in a worker thread, since the SDK may
+        fetch Google's public signing keys.
+        """
+        decoded_token = self._verified_tokens.get(self._token_key(id_token))
+        if decoded_token is not None:
+            return decoded_token
+        return await anyio.to_thread.run_sync(self.verify_id_token_sync, id_token)
+    
+    @staticmethod
+    def _token_key(id_token: str) -> bytes:
+        return hashlib.blake2b(id_token.encode(), digest_size=16).digest()
+    
+    def verify_id_token_sync(self, id_token: str) -> Dict[str, Any]:
+        """Synchronous core of verify_id_token, usable from sync key functions."""
         if not self.is_available():
-            raise FirebaseError("Firebase not initialized")
+            raise FirebaseError(UNAVAILABLE, "Firebase not initialized")
             
+        key = self._token_key(id_token)
+        decoded_token = self._verified_tokens.get(key)
+        if decoded_token is not None:
+            return decoded_token
+
         try:
             decoded_token = auth.verify_id_token(id_token)
+            # Signature checks are repeated at most once per TTL and never
+            # past the token's own expiry
+            self._verified_tokens.set(
+                key, decoded_token,
+                min(self._verified_tokens.ttl, decoded_token["exp"] - time.time())
+            )
             return decoded_token
             
-        except auth.InvalidIdTokenError:
-            raise FirebaseError("Invalid ID token")
-        except auth.ExpiredIdTokenError:
-            raise FirebaseError("Expired ID token")
+        # ExpiredIdTokenError subclasses InvalidIdTokenError, so check it first
+        except auth.ExpiredIdTokenError as e:
+            raise FirebaseError(INVALID_ARGUMENT, "Expired ID token", cause=e)
+        except auth.InvalidIdTokenError as e:
+            raise FirebaseError(INVALID_ARGUMENT, "Invalid ID token", cause=e)
         except FirebaseError as e:
             logger.error(f"Failed to verify ID token: {str(e)}")
             raise
@@ -104,7 +138,7 @@ class FirebaseService:
     async def get_user(self, uid: str) -> Optional[FirebaseUserResponse]:
         """Get user by UID."""
         if not self.is_available():
-            raise FirebaseError("Firebase not initialized")
+            raise FirebaseError(UNAVAILABLE, "Firebase not initialized")
             
         try:
             user_record = auth.get_user(uid)
@@ -125,7 +159,7 @@ class FirebaseService:
     async def update_user(self, uid: str, **kwargs) -> FirebaseUserResponse:
         """Update Firebase user."""
         if not self.is_available():
-            raise FirebaseError("Firebase not initialized")
+            raise FirebaseError(UNAVAILABLE, "Firebase not initialized")
             
         try:
             user_record = auth.update_user(uid, **kwargs)
@@ -144,10 +178,11 @@ class FirebaseService:
     async def delete_user(self, uid: str) -> bool:
         """Delete Firebase user."""
         if not self.is_available():
-            raise FirebaseError("Firebase not initialized")
+            raise FirebaseError(UNAVAILABLE, "Firebase not initialized")
             
         try:
             auth.delete_user(uid)
+            self._forget_user_tokens(uid)
             return True
             
         except FirebaseError as e:
@@ -157,23 +192,23 @@ class FirebaseService:
     async def revoke_refresh_tokens(self, uid: str) -> None:
         """Revoke all refresh tokens for a user."""
         if not self.is_available():
-            raise FirebaseError("Firebase not initialized")
+            raise FirebaseError(UNAVAILABLE, "Firebase not initialized")
             
         try:
             auth.revoke_refresh_tokens(uid)
+            self._forget_user_tokens(uid)
             
         except FirebaseError as e:
             logger.error(f"Failed to revoke tokens: {str(e)}")
             raise
+    
+    def _forget_user_tokens(self, uid: str) -> None:
+        """Drop cached ID-token verifications for a user."""
+        self._verified_tokens.discard_where(lambda claims: claims.get("uid") == uid)
 
 
 # Global instance
-_firebase_service: Optional[FirebaseService] = None
-
-
+@lru_cache(maxsize=1)
 def get_firebase_service() -> FirebaseService:
-    """Get Firebase service instance."""
-    global _firebase_service
-    if _firebase_service is None:
-        _firebase_service = FirebaseService()
-    return _firebase_service
+    """Get cached FirebaseService instance."""
+    return FirebaseService()
@@ -2,7 +2,7 @@ from pathlib import Path
 from typing import Optional
 from functools import lru_cache
 
-from ..utils.file_utils import download_from_url, validate_file_extension, cleanup_file
+from ..utils.file_utils import fetch_from_url, validate_file_extension, cleanup_file
 from ..core.exceptions import URLProcessingError
 from ..models.enums import OutputFormat
 from ..models.schemas import ProcessingResponse
@@ -32,16 +32,23 @@ class URLService:
         try:
             logger.info(f"Processing document from URL: {url}")
 
-            # Download file from URL
-            temp_file = await download_from_url(url)
+            # Download file from URL; small documents stay in memory
+            filename, body = await fetch_from_url(url, settings.url_in_memory_max_size)
 
-            # Validate file type
-            validate_file_extension(temp_file.name)
+            if isinstance(body, bytes):
+                result = await self.docling_service.process_bytes(
+                    filename, body, output_format, use_ocr
+                )
+            else:
+                temp_file = body
+
+                # Validate file type
+                validate_file_extension(temp_file.name)
 
-            # Process with DoclingService
-            result = await self.docling_service.process_document(
-                temp_file, output_format, use_ocr
-            )
+                # Process with DoclingService
+                result = await self.docling_service.process_document(
+                    temp_file, output_format, use_ocr
+                )
 
             # Add URL to metadata
             if result.metadata:
@@ -0,0 +1,119 @@
+"""Small in-process caching helpers."""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire after a time-to-live.
+
+    Safe to share between the event loop and worker threads: each method
+    either completes or tolerates an entry removed concurrently.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired."""
+        item = self._data.get(key)
+        if item is None:
+            return default
+
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            return default
+
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            pass
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value under key, evicting the least recently used entries."""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            self._data.pop(key, None)
+            return
+
+        self._data[key] = (time.monotonic() + ttl, value)
+        try:
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        except KeyError:
+            pass
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove key and return its value, or default if missing."""
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def discard_where(self, predicate: Callable[[Any], bool]) -> int:
+        """Remove every entry whose value matches predicate."""
+        stale = [key for key, (_, value) in list(self._data.items()) if predicate(value)]
+        for key in stale:
+            self._data.pop(key, None)
+        return len(stale)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._data.clear()
+
+
+class SWRCache:
+    """Async cache that serves stale values while refreshing them in the background.
+
+    Entries younger than fresh_ttl are returned as is. Older ones are still
+    returned until stale_ttl, but trigger a single background refresh.
+    Concurrent misses for the same key share one fetch.
+    """
+
+    def __init__(self, maxsize: int, fresh_ttl: float, stale_ttl: float):
+        self.fresh_ttl = fresh_ttl
+        self._entries = TTLCache(maxsize, stale_ttl)
+        self._pending: Dict[Hashable, "asyncio.Task[Any]"] = {}
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, calling fetch on a miss."""
+        entry = self._entries.get(key)
+        task = self._pending.get(key)
+        if entry is None:
+            if task is None:
+                task = self._refresh(key, fetch)
+            return await asyncio.shield(task)
+
+        fetched_at, value = entry
+        if task is None and time.monotonic() - fetched_at >= self.fresh_ttl:
+            self._refresh(key, fetch)
+        return value
+
+    def _refresh(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> "asyncio.Task[Any]":
+        async def run() -> Any:
+            value = await fetch()
+            self._entries.set(key, (time.monotonic(), value))
+            return value
+
+        task = self._pending[key] = asyncio.create_task(run())
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return task
+
+    def _finish(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        self._pending.pop(key, None)
+        # A failed background refresh keeps serving the stale value; waiting
+        # callers see the exception through their own await.
+        if not task.cancelled():
+            task.exception()
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._entries.clear()
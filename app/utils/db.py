@@ -1,14 +1,57 @@
 # db.py
+import hashlib
+import hmac
+import secrets
 import sqlite3
-from datetime import datetime, timezone, timedelta
+import threading
+from functools import lru_cache
 from typing import Optional, Tuple, List
 import bcrypt
 
+from ..core.config.config import get_settings
+from .cache import TTLCache
+
 DB_PATH = "messages.db"
 
+settings = get_settings()
+
+# Recently failed logins, so repeated identical probes skip bcrypt. Only
+# failures are cached: a cached success would outlive a credential change.
+# Keys are keyed with a per-process secret, so the cache holds nothing that
+# can be checked against password guesses offline. Logins run in worker
+# threads, hence the lock.
+_failed_logins = TTLCache(maxsize=10_000, ttl=60)
+_failed_logins_lock = threading.Lock()
+_LOGIN_KEY_SECRET = secrets.token_bytes(32)
+
+
+def _login_key(username: str, password: str) -> Tuple[str, bytes]:
+    return username, hmac.new(_LOGIN_KEY_SECRET, password.encode(), hashlib.sha256).digest()
+
+
+@lru_cache(maxsize=1)
+def _dummy_hash() -> bytes:
+    """A hash to check against for unknown users, so they cost a bcrypt too."""
+    return bcrypt.hashpw(b"dummy-password", bcrypt.gensalt(rounds=settings.bcrypt_rounds))
+
+
+# One long-lived connection per thread. `with get_connection() as conn:`
+# commits or rolls back on exit but leaves the connection open for reuse.
+_local = threading.local()
 
-def get_connection():
-    return sqlite3.connect(DB_PATH)
+
+def get_connection() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH)
+        # auto_vacuum only takes effect on a new file, and must precede WAL
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        _local.conn = conn
+    return conn
 
 
 def init_db():
@@ -35,13 +78,16 @@ def init_db():
                 FOREIGN KEY (recipient_id) REFERENCES users(id)
             )
         """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_msg_recip ON messages(recipient_id)")
         conn.commit()
 
 # User helpers
 
 
 def register_user(username: str, password: str) -> bool:
-    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    hashed = bcrypt.hashpw(
+        password.encode(), bcrypt.gensalt(rounds=settings.bcrypt_rounds)).decode()
     try:
         with get_connection() as conn:
             cursor = conn.cursor()
@@ -50,12 +96,21 @@ def register_user(username: str, password: str) -> bool:
                 (username, hashed)
             )
             conn.commit()
-        return True
     except sqlite3.IntegrityError:
         return False
 
+    # A failed login with these credentials may be cached from before the user existed
+    with _failed_logins_lock:
+        _failed_logins.pop(_login_key(username, password))
+    return True
+
 
 def authenticate_user(username: str, password: str) -> Optional[int]:
+    key = _login_key(username, password)
+    with _failed_logins_lock:
+        if _failed_logins.get(key):
+            return None
+
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
@@ -63,9 +118,17 @@ def authenticate_user(username: str, password: str) -> Optional[int]:
             (username,)
         )
         row = cursor.fetchone()
-        if row and bcrypt.checkpw(password.encode(), row[1].encode()):
-            return row[0]
-    return None
+    if row is None:
+        # Same bcrypt cost as a wrong password, so response times don't
+        # reveal which usernames exist
+        bcrypt.checkpw(password.encode(), _dummy_hash())
+        user_id = None
+    else:
+        user_id = row[0] if bcrypt.checkpw(password.encode(), row[1].encode()) else None
+    if user_id is None:
+        with _failed_logins_lock:
+            _failed_logins.set(key, True)
+    return user_id
 
 
 def get_user_id(username: str) -> Optional[int]:
@@ -100,24 +163,17 @@ def add_message(sender_id: int, recipient_id: int, message: str, salt: Optional[
 def get_messages_for_user(user_id: int) -> List[Tuple]:
     with get_connection() as conn:
         cursor = conn.cursor()
-        now = datetime.now(timezone.utc)
+        # Expire stale messages in SQL, then read what is left
+        cursor.execute(
+            "DELETE FROM messages WHERE recipient_id = ? "
+            "AND strftime('%s', timestamp) + expire_in_seconds <= CAST(strftime('%s', 'now') AS INTEGER)",
+            (user_id,)
+        )
         cursor.execute(
             "SELECT id, sender_id, message, salt, timestamp, expire_in_seconds FROM messages WHERE recipient_id = ?",
             (user_id,)
         )
-        results = cursor.fetchall()
-        valid = []
-        for id, sid, msg, salt, ts, expire in results:
-            try:
-                timestamp = datetime.fromisoformat(ts)
-            except Exception:
-                timestamp = datetime.strptime(ts, '%Y-%m-%d %H:%M:%S')
-            timestamp = timestamp.replace(tzinfo=timezone.utc)
-            if now < timestamp + timedelta(seconds=expire):
-                valid.append((id, sid, msg, salt, ts, expire))
-            else:
-                delete_message_by_id(id)
-        return valid
+        return cursor.fetchall()
 
 
 def delete_message_by_id(message_id: int):
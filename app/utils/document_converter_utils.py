@@ -1,23 +1,37 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse, PlainTextResponse, HTMLResponse
+from fastapi.responses import PlainTextResponse, HTMLResponse, Response
 from pathlib import Path
 from functools import lru_cache
 from enum import Enum
-import json
-import shutil
+from typing import Union
 import logging
+import tempfile
+import aiofiles
+import anyio
+import orjson
 from docling.document_converter import DocumentConverter
 
 # Logging setup
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI(title="Docling PDF API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load the Docling models at startup rather than on the first upload."""
+    await anyio.to_thread.run_sync(get_converter)
+    yield
+
+
+app = FastAPI(title="Docling PDF API", lifespan=lifespan)
 
 # Temporary upload folder
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1MB
+MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+
 
 # Enum for document types
 class DocumentType(str, Enum):
@@ -59,22 +73,27 @@ def process_document(file_path: Path, use_ocr: bool = False):
     return result.document
 
 
-def convert_to_type(doc, dest_type: DocumentType) -> str:
-    """Convert DoclingDocument to desired output type"""
-    if dest_type in (DocumentType.MD, DocumentType.MARKDOWN):
-        return doc.export_to_markdown()
-    elif dest_type == DocumentType.HTML:
-        return doc.export_to_html()
-    elif dest_type in (DocumentType.TXT, DocumentType.TEXT):
-        return doc.export_to_text()
-    elif dest_type == DocumentType.DOCTAGS:
-        return doc.export_to_doctags()
-    elif dest_type == DocumentType.JSON:
-        return json.dumps(doc.export_to_dict(), indent=2)
-    else:
+# Exporter per destination type
+_EXPORTERS = {
+    DocumentType.MD: lambda doc: doc.export_to_markdown(),
+    DocumentType.MARKDOWN: lambda doc: doc.export_to_markdown(),
+    DocumentType.HTML: lambda doc: doc.export_to_html(),
+    DocumentType.TXT: lambda doc: doc.export_to_text(),
+    DocumentType.TEXT: lambda doc: doc.export_to_text(),
+    DocumentType.DOCTAGS: lambda doc: doc.export_to_doctags(),
+    # Serialized once, as bytes the route sends unchanged
+    DocumentType.JSON: lambda doc: orjson.dumps(doc.export_to_dict()),
+}
+
+
+def convert_to_type(doc, dest_type: DocumentType) -> Union[str, bytes]:
+    """Convert DoclingDocument to desired output type (JSON as bytes)"""
+    exporter = _EXPORTERS.get(dest_type)
+    if exporter is None:
         raise DocumentConversionError(
             f"Unsupported destination type: {dest_type}")
-        
+    return exporter(doc)
+
 
 def convert_from_url(url: str):
     pass
@@ -92,61 +111,26 @@ async def upload_document(
     :param dest_type: Desired output format
     :param use_ocr: Enable OCR for scanned documents
     """
-    temp_file_path = UPLOAD_DIR / file.filename
+    # Unique temp name; keep the suffix so Docling can detect the format
+    fd, temp_path = tempfile.mkstemp(
+        suffix=Path(file.filename or "").suffix, prefix="upload_", dir=UPLOAD_DIR
+    )
+    temp_file_path = Path(temp_path)
     try:
-        # Save uploaded file temporarily
-        with open(temp_file_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-
-        # Process document
-        doc = process_document(temp_file_path, use_ocr)
-
-        # Convert to requested format
-        content = convert_to_type(doc, dest_type)
-
-        # Return proper response type
-        if dest_type == DocumentType.HTML:
-            return HTMLResponse(content=content)
-        elif dest_type in (DocumentType.TXT, DocumentType.TEXT, DocumentType.MD, DocumentType.MARKDOWN, DocumentType.DOCTAGS):
-            return PlainTextResponse(content=content)
-        elif dest_type == DocumentType.JSON:
-            return JSONResponse(content=json.loads(content))
-        else:
-            raise HTTPException(
-                status_code=400, detail="Unsupported destination type")
-
-    except DocumentConversionError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-    finally:
-        # Cleanup temp file
-        if temp_file_path.exists():
-            temp_file_path.unlink()
-
-
-@app.post("/upload/document")
-async def upload_document(
-    file: UploadFile = File(...),
-    dest_type: DocumentType = Form(...),
-    use_ocr: bool = Form(False)
-):
-    """
-    Upload a document and return it in the requested format.
-    :param file: Uploaded file
-    :param dest_type: Desired output format
-    :param use_ocr: Enable OCR for scanned documents
-    """
-    temp_file_path = UPLOAD_DIR / file.filename
-    try:
-        # Save uploaded file temporarily
-        with open(temp_file_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-
-        # Process document
-        doc = process_document(temp_file_path, use_ocr)
-
-        # Convert to requested format
-        content = convert_to_type(doc, dest_type)
+        # Stream the upload to disk in chunks, enforcing the size limit
+        written = 0
+        async with aiofiles.open(fd, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                written += len(chunk)
+                if written > MAX_FILE_SIZE:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File size exceeds maximum allowed size of {MAX_FILE_SIZE} bytes")
+                await f.write(chunk)
+
+        # Process document and convert to requested format off the event loop
+        doc = await anyio.to_thread.run_sync(process_document, temp_file_path, use_ocr)
+        content = await anyio.to_thread.run_sync(convert_to_type, doc, dest_type)
 
         # Return proper response type
         if dest_type == DocumentType.HTML:
@@ -154,7 +138,7 @@ async def upload_document(
         elif dest_type in (DocumentType.TXT, DocumentType.TEXT, DocumentType.MD, DocumentType.MARKDOWN, DocumentType.DOCTAGS):
             return PlainTextResponse(content=content)
         elif dest_type == DocumentType.JSON:
-            return JSONResponse(content=json.loads(content))
+            return Response(content=content, media_type="application/json")
         else:
             raise HTTPException(
                 status_code=400, detail="Unsupported destination type")
@@ -1,52 +1,105 @@
 # app/encryption.py
 import os
 import base64
+import hashlib
+import hmac
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives import hashes, padding
 from cryptography.hazmat.backends import default_backend
 
+from ..core.config.config import get_settings
+from .cache import TTLCache
+
+settings = get_settings()
+
+# AES-GCM ciphertexts are tagged so legacy AES-CBC ones (plain base64,
+# which never contains ':') still decrypt
+GCM_PREFIX = "v2:"
+GCM_NONCE_SIZE = 12
+SALT_SIZE = 16
+
+# Algorithm objects are stateless; build them once
+_SHA256 = hashes.SHA256()
+_PKCS7 = padding.PKCS7(128)
+
+# Recently derived keys, so a burst of messages under one key and salt is
+# stretched once. Entries expire quickly and are keyed by an HMAC under a
+# per-process secret, so passphrases are never held in memory.
+_derived_keys = TTLCache(maxsize=1024, ttl=60)
+_DERIVED_KEY_SECRET = os.urandom(32)
+
+
+def generate_salt() -> str:
+    """Return a new random salt, base64-encoded, for derive_key."""
+    return base64.b64encode(os.urandom(SALT_SIZE)).decode()
+
 
 def derive_key(key: bytes, salt: bytes = None) -> bytes: # type: ignore
     if salt:
+        return _pbkdf2(key, salt, settings.pbkdf2_iterations)
+    # Unsalted keys are only zero-padded; kept so existing messages decrypt
+    return (key + b'\0' * 32)[:32]
+
+
+def _pbkdf2(key: bytes, salt: bytes, iterations: int) -> bytes:
+    """PBKDF2-HMAC-SHA256, reusing a key derived within the last minute."""
+    cache_key = hmac.new(
+        _DERIVED_KEY_SECRET,
+        b"%d:%d:" % (iterations, len(salt)) + salt + key,
+        hashlib.sha256
+    ).digest()
+    derived = _derived_keys.get(cache_key)
+    if derived is None:
         kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
+            algorithm=_SHA256,
             length=32,
             salt=salt,
-            iterations=100_000,
+            iterations=iterations,
             backend=default_backend()
         )
-        return kdf.derive(key)
-    return (key + b'\0' * 32)[:32]
+        derived = kdf.derive(key)
+        _derived_keys.set(cache_key, derived)
+    return derived
 
 
+# Legacy AES-CBC helpers, kept to decrypt messages stored before AES-GCM
 def get_cipher(key: bytes, iv: bytes):
     return Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
 
 
-def pad_message(data: bytes) -> bytes:
-    padder = padding.PKCS7(128).padder()
-    return padder.update(data) + padder.finalize()
-
-
 def unpad_message(data: bytes) -> bytes:
-    unpadder = padding.PKCS7(128).unpadder()
+    # Padding is validated, so keep cryptography's constant-time unpadder
+    unpadder = _PKCS7.unpadder()
     return unpadder.update(data) + unpadder.finalize()
 
 
+def encrypt_bytes(plaintext: bytes, key: bytes, salt: bytes = None) -> bytes:  # type: ignore
+    """AES-GCM encrypt to raw nonce + ciphertext + tag, for binary transports."""
+    nonce = os.urandom(GCM_NONCE_SIZE)
+    return nonce + AESGCM(derive_key(key, salt)).encrypt(nonce, plaintext, None)
+
+
+def decrypt_bytes(data: bytes, key: bytes, salt: bytes = None) -> bytes:  # type: ignore
+    """Inverse of encrypt_bytes; raises InvalidTag if data was altered."""
+    nonce = data[:GCM_NONCE_SIZE]
+    return AESGCM(derive_key(key, salt)).decrypt(nonce, data[GCM_NONCE_SIZE:], None)
+
+
 def encrypt_message(plaintext: str, key: str, salt_b64: str = None) -> str:  # type: ignore
     salt = base64.b64decode(salt_b64) if salt_b64 else None
-    derived_key = derive_key(key.encode(), salt) # type: ignore
-    iv = os.urandom(16)
-    cipher = get_cipher(derived_key, iv)
-    encryptor = cipher.encryptor()
-    padded = pad_message(plaintext.encode())
-    ciphertext = encryptor.update(padded) + encryptor.finalize()
-    return base64.b64encode(iv + ciphertext).decode()
+    raw = encrypt_bytes(plaintext.encode(), key.encode(), salt)  # type: ignore
+    return GCM_PREFIX + base64.b64encode(raw).decode()
 
 
 def decrypt_message(ciphertext_b64: str, key: str, salt_b64: str = None) -> str:  # type: ignore
     salt = base64.b64decode(salt_b64) if salt_b64 else None
+    if ciphertext_b64.startswith(GCM_PREFIX):
+        raw = base64.b64decode(ciphertext_b64[len(GCM_PREFIX):])
+        return decrypt_bytes(raw, key.encode(), salt).decode()  # type: ignore
+
+    # Legacy AES-CBC message
     derived_key = derive_key(key.encode(), salt)  # type: ignore
     raw = base64.b64decode(ciphertext_b64)
     iv, ciphertext = raw[:16], raw[16:]
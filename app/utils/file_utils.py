@@ -1,9 +1,14 @@
 import aiofiles
 import aiohttp
+from contextlib import contextmanager
 from pathlib import Path
-from typing import BinaryIO, Optional
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
 import tempfile
-import hashlib
+import errno
+import os
+from urllib.parse import urlsplit
 from ..core.config.config import get_settings
 from ..core.exceptions import FileSizeError, UnsupportedFileTypeError, URLProcessingError
 from ..utils.logger import setup_logger
@@ -11,30 +16,125 @@ from ..utils.logger import setup_logger
 settings = get_settings()
 logger = setup_logger(__name__, settings.log_level)
 
+_ALLOWED_EXTENSIONS = settings.allowed_extensions_set
 
-async def save_upload_file(file: BinaryIO, filename: str) -> Path:
-    """Save uploaded file to temporary directory."""
-    upload_dir = Path(settings.upload_dir)
-    upload_dir.mkdir(exist_ok=True)
+# Temp directory for uploads and URL downloads, created once at import
+_UPLOAD_DIR = Path(settings.upload_dir)
+_UPLOAD_DIR.mkdir(exist_ok=True)
 
-    # Generate unique filename to avoid conflicts
-    file_hash = hashlib.md5(filename.encode()).hexdigest()[:8]
-    safe_filename = f"{file_hash}_{filename}"
-    file_path = upload_dir / safe_filename
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1MB
+UPLOAD_BUFFER_POOL_SIZE = 32
 
+# Extensions for URL downloads whose name doesn't carry an allowed one
+_CONTENT_TYPE_EXTENSIONS = {
+    'application/pdf': '.pdf',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': '.docx',
+    'application/msword': '.doc',
+    'text/html': '.html',
+    'text/plain': '.txt',
+    'text/markdown': '.md',
+}
+
+# Shared across downloads so keep-alive connections and DNS lookups are
+# reused; created on first use and closed at shutdown
+_http_session: Optional[aiohttp.ClientSession] = None
+
+# Reusable chunk buffers so uploads don't allocate a fresh bytes object per chunk
+_upload_buffers: List[bytearray] = []
+
+
+@contextmanager
+def _upload_buffer() -> Iterator[memoryview]:
+    """Borrow a chunk buffer from the pool, returning it afterwards."""
+    buffer = _upload_buffers.pop() if _upload_buffers else bytearray(UPLOAD_CHUNK_SIZE)
+    view = memoryview(buffer)
     try:
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = file.read()
+        yield view
+    finally:
+        view.release()
+        if len(_upload_buffers) < UPLOAD_BUFFER_POOL_SIZE:
+            _upload_buffers.append(buffer)
 
-            # Check file size
-            if len(content) > settings.max_file_size:
-                raise FileSizeError(
-                    f"File size exceeds maximum allowed size of {settings.max_file_size} bytes"
-                )
 
-            await f.write(content)
+async def _read_upload_chunk(file: UploadFile, buffer: memoryview) -> int:
+    """Read the next chunk of an upload into buffer, returning the byte count."""
+    # Spooled uploads still in memory are read inline, as UploadFile.read does
+    if getattr(file, "_in_memory", False):
+        return file.file.readinto(buffer)
+    return await run_in_threadpool(file.file.readinto, buffer)
+
+
+def _sendfile_upload(src: BinaryIO, out_fd: int) -> bool:
+    """Copy the rest of src into out_fd with os.sendfile.
+
+    Returns False, with nothing written, when the platform or file can't
+    use sendfile so the caller falls back to chunked copying.
+    """
+    if not hasattr(os, "sendfile"):
+        return False
+    try:
+        in_fd = src.fileno()
+    except OSError:
+        return False
+
+    offset = src.tell()
+    remaining = os.fstat(in_fd).st_size - offset
+    copied = 0
+    try:
+        if remaining > settings.max_file_size:
+            raise FileSizeError(
+                f"File size exceeds maximum allowed size of {settings.max_file_size} bytes"
+            )
+
+        while copied < remaining:
+            try:
+                sent = os.sendfile(out_fd, in_fd, offset + copied, remaining - copied)
+            except OSError as e:
+                if copied == 0 and e.errno in (errno.EINVAL, errno.ENOSYS, errno.ENOTSOCK):
+                    return False
+                raise
+            if sent == 0:
+                break
+            copied += sent
+    except BaseException:
+        os.close(out_fd)
+        raise
+
+    os.close(out_fd)
+    return True
 
-        logger.info(f"File saved: {file_path}")
+
+async def save_upload_file(file: UploadFile, filename: str) -> Path:
+    """Stream uploaded file to temporary directory in chunks."""
+    # Unique temp file keeps concurrent uploads of the same name apart;
+    # the suffix is preserved so Docling can detect the format.
+    fd, temp_path = tempfile.mkstemp(
+        suffix=Path(filename).suffix, prefix="upload_", dir=_UPLOAD_DIR
+    )
+    file_path = Path(temp_path)
+
+    try:
+        # Uploads spooled to disk are copied file to file inside the kernel
+        if not getattr(file, "_in_memory", True):
+            if await run_in_threadpool(_sendfile_upload, file.file, fd):
+                logger.info("File saved: %s", file_path)
+                return file_path
+
+        async with aiofiles.open(fd, 'wb') as f:
+            with _upload_buffer() as buffer:
+                written = 0
+                while n := await _read_upload_chunk(file, buffer):
+                    written += n
+
+                    # Check file size
+                    if written > settings.max_file_size:
+                        raise FileSizeError(
+                            f"File size exceeds maximum allowed size of {settings.max_file_size} bytes"
+                        )
+
+                    await f.write(buffer[:n])
+
+        logger.info("File saved: %s", file_path)
         return file_path
 
     except Exception as e:
@@ -43,47 +143,98 @@ async def save_upload_file(file: BinaryIO, filename: str) -> Path:
         raise e
 
 
+def _get_http_session() -> aiohttp.ClientSession:
+    """Return the shared download session, creating it on first use."""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=8, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=settings.url_timeout)
+        )
+    return _http_session
+
+
+async def close_http_session() -> None:
+    """Close the shared download session, if one was opened."""
+    global _http_session
+    if _http_session is not None:
+        session, _http_session = _http_session, None
+        await session.close()
+
+
 async def download_from_url(url: str) -> Path:
     """Download file from URL and save to temporary location."""
-    temp_dir = Path(settings.upload_dir)
-    temp_dir.mkdir(exist_ok=True)
+    _, file_path = await fetch_from_url(url)
+    return file_path
+
 
+async def fetch_from_url(url: str, in_memory_max_size: int = 0) -> Tuple[str, Union[bytes, Path]]:
+    """
+    Download a URL, keeping the body in memory when its declared size is at
+    most in_memory_max_size and writing it to a temporary file otherwise.
+    Returns the filename and either the body or the temporary file's path.
+    """
     try:
-        async with aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=settings.url_timeout)
-        ) as session:
-            with session.get(url) as response:
-                response.raise_for_status()
+        async with _get_http_session().get(url) as response:
+            response.raise_for_status()
+
+            # Reject on headers alone, before any of the body is read
+            content_length = response.headers.get('content-length')
+            if content_length and int(content_length) > settings.max_url_file_size:
+                # Drop the connection rather than drain the body
+                response.close()
+                raise FileSizeError(
+                    f"URL file size exceeds maximum allowed size of {settings.max_url_file_size} bytes"
+                )
 
-                # Check content length
-                content_length = response.headers.get('content-length')
-                if content_length and int(content_length) > settings.max_url_file_size:
-                    raise FileSizeError(
-                        f"URL file size exceeds maximum allowed size of {settings.max_url_file_size} bytes"
-                    )
+            # Determine filename from URL or content-disposition
+            filename = get_filename_from_response(response, url)
+            try:
+                validate_file_extension(filename)
+            except UnsupportedFileTypeError:
+                response.close()
+                raise
 
-                # Determine filename from URL or content-disposition
-                filename = get_filename_from_response(response, url)
+            if content_length and int(content_length) <= in_memory_max_size:
+                data = await response.read()
+                logger.info("File downloaded from URL into memory: %s", url)
+                return filename, data
 
-                # Create temporary file
-                file_path = temp_dir / \
-                    f"url_download_{hashlib.md5(url.encode()).hexdigest()[:8]}_{filename}"
+            # Unique temp file, as for uploads: concurrent downloads of one
+            # URL stay apart and the server-supplied name never becomes a path
+            fd, temp_path = tempfile.mkstemp(
+                suffix=Path(filename).suffix, prefix="url_download_", dir=_UPLOAD_DIR
+            )
+            file_path = Path(temp_path)
 
-                async with aiofiles.open(file_path, 'wb') as f:
+            try:
+                async with aiofiles.open(fd, 'wb') as f:
                     downloaded_size = 0
-                    async for chunk in response.content.iter_chunked(8192):
+                    # Network reads arrive in small pieces; buffer them so each
+                    # write (a thread-pool hop) carries UPLOAD_CHUNK_SIZE bytes
+                    pending = bytearray()
+                    async for chunk in response.content.iter_any():
                         downloaded_size += len(chunk)
 
                         # Check size during download
                         if downloaded_size > settings.max_url_file_size:
+                            response.close()
                             raise FileSizeError(
                                 f"URL file size exceeds maximum allowed size during download"
                             )
 
-                        await f.write(chunk)
+                        pending += chunk
+                        if len(pending) >= UPLOAD_CHUNK_SIZE:
+                            await f.write(pending)
+                            pending.clear()
+                    if pending:
+                        await f.write(pending)
+            except BaseException:
+                cleanup_file(file_path)
+                raise
 
-                logger.info(f"File downloaded from URL: {url} -> {file_path}")
-                return file_path
+            logger.info("File downloaded from URL: %s -> %s", url, file_path)
+            return filename, file_path
 
     except aiohttp.ClientError as e:
         raise URLProcessingError(f"Failed to download from URL: {e}")
@@ -97,14 +248,21 @@ def get_filename_from_response(response: aiohttp.ClientResponse, url: str) -> st
         filename = content_disposition.split('filename=')[1].strip('"')
         return filename
 
-    # Fall back to URL path
-    return Path(url).name or "downloaded_file"
+    # Fall back to URL path, ignoring any query string
+    filename = Path(urlsplit(url).path).name or "downloaded_file"
+
+    # Name the file after its content type if the path doesn't
+    if os.path.splitext(filename)[1].lower() not in _ALLOWED_EXTENSIONS:
+        extension = _CONTENT_TYPE_EXTENSIONS.get(response.content_type)
+        if extension:
+            filename += extension
+    return filename
 
 
 def validate_file_extension(filename: str) -> None:
     """Validate file extension against allowed types."""
-    file_ext = Path(filename).suffix.lower()
-    if file_ext not in settings.allowed_extensions:
+    file_ext = os.path.splitext(filename)[1].lower()
+    if file_ext not in _ALLOWED_EXTENSIONS:
         raise UnsupportedFileTypeError(
             f"File type {file_ext} not supported. Allowed types: {settings.allowed_extensions}"
         )
@@ -115,6 +273,6 @@ def cleanup_file(file_path: Path) -> None:
     try:
         if file_path.exists():
             file_path.unlink()
-            logger.info(f"Cleaned up file: {file_path}")
+            logger.info("Cleaned up file: %s", file_path)
     except Exception as e:
-        logger.warning(f"Failed to cleanup file {file_path}: {e}")
+        logger.warning("Failed to cleanup file %s: %s", file_path, e)
@@ -1,4 +1,5 @@
 import logging
+import logging.handlers
 import sys
 from typing import Optional
 
@@ -6,9 +7,15 @@ from typing import Optional
 def setup_logger(
     name: str,
     level: str = "INFO",
-    format_string: Optional[str] = None
+    format_string: Optional[str] = None,
+    buffer_capacity: int = 0
 ) -> logging.Logger:
-    """Set up structured logging."""
+    """Set up structured logging.
+
+    Records are written to stdout as they arrive. A positive buffer_capacity
+    batches them instead, flushing when the buffer fills, a WARNING or higher
+    arrives, or the interpreter exits; buffered records are lost on a crash.
+    """
 
     if format_string is None:
         format_string = (
@@ -21,7 +28,15 @@ def setup_logger(
     if not logger.handlers:
         handler = logging.StreamHandler(sys.stdout)
         handler.setFormatter(logging.Formatter(format_string))
+        if buffer_capacity > 0:
+            handler = logging.handlers.MemoryHandler(
+                buffer_capacity,
+                flushLevel=logging.WARNING,
+                target=handler
+            )
         logger.addHandler(handler)
+        # Our handler writes the record; don't repeat it through root handlers
+        logger.propagate = False
 
     logger.setLevel(getattr(logging, level.upper()))
     return logger
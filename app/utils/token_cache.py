@@ -0,0 +1,175 @@
+"""In-process cache of resolved bearer-token identities."""
+
+import hashlib
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import anyio
+from firebase_admin.exceptions import FirebaseError
+
+from .cache import TTLCache
+from ..services.firebase_service import FirebaseService, get_firebase_service
+from ..services.api_token_service import (
+    TOKEN_PREFIX as API_TOKEN_PREFIX, APITokenService, get_api_token_service
+)
+
+API_TOKEN_AUTH = "api_token"
+FIREBASE_AUTH = "firebase"
+ALL_AUTH_TYPES = (API_TOKEN_AUTH, FIREBASE_AUTH)
+
+# Resolved identities, keyed by a digest of the bearer token so raw
+# credentials are never kept in memory.
+_identities = TTLCache(maxsize=100_000, ttl=60)
+
+# Tokens that recently failed every verifier, with the verifier's reason
+# when it gave one. Kept short-lived and bounded separately so a flood of
+# bad credentials cannot grow memory unbounded.
+_failures = TTLCache(maxsize=10_000, ttl=5)
+
+FAILED = object()
+
+
+def token_key(token: str) -> bytes:
+    """Return the cache key for a bearer token."""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+def get_cached_identity(key: bytes) -> Optional[Dict[str, Any]]:
+    """Return the cached identity for a token key, if any."""
+    return _identities.get(key)
+
+
+def cache_identity(key: bytes, identity: Dict[str, Any]) -> None:
+    """Cache a resolved identity, never past the token's own expiry."""
+    ttl = _identities.ttl
+    firebase_token = identity.get("firebase_token")
+    if firebase_token and "exp" in firebase_token:
+        ttl = min(ttl, firebase_token["exp"] - time.time())
+    _identities.set(key, identity, ttl)
+
+
+def is_known_failure(key: bytes) -> bool:
+    """Return True if the token recently failed verification."""
+    return _failures.get(key) is not None
+
+
+def failure_reason(key: bytes) -> Optional[str]:
+    """Return why the token recently failed verification, if known."""
+    reason = _failures.get(key)
+    return reason if isinstance(reason, str) else None
+
+
+def record_failure(key: bytes, reason: Optional[str] = None) -> None:
+    """Remember that a token failed verification, and why if known."""
+    _failures.set(key, reason or FAILED)
+
+
+def invalidate_user(user_id: str) -> None:
+    """Drop every cached identity belonging to user_id."""
+    _identities.discard_where(lambda identity: identity["user_id"] == user_id)
+
+
+def candidate_auth_types(token: str) -> Tuple[str, ...]:
+    """Return the verifiers that could possibly accept this token."""
+    if token.startswith(API_TOKEN_PREFIX):
+        return (API_TOKEN_AUTH,)
+    # Firebase ID tokens are JWTs: base64url '{"' header and three segments
+    if token.startswith("eyJ") and token.count(".") == 2:
+        return (FIREBASE_AUTH,)
+    # Unprefixed API tokens issued before the prefix was introduced
+    return ALL_AUTH_TYPES
+
+
+def resolve_identity(
+    token: str,
+    auth_types: Tuple[str, ...] = ALL_AUTH_TYPES,
+    firebase_service: Optional[FirebaseService] = None,
+    api_token_service: Optional[APITokenService] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Resolve a bearer token to a user identity using the allowed verifiers.
+    Auth dependencies, the rate limiter and analytics all go through here
+    so a token is verified at most once per cache TTL.
+    """
+    key = token_key(token)
+    identity = get_cached_identity(key)
+    if identity:
+        return identity if identity["auth_type"] in auth_types else None
+    if is_known_failure(key):
+        return None
+
+    candidates = candidate_auth_types(token)
+    tried = tuple(t for t in candidates if t in auth_types)
+    reason = None
+
+    # Try API token first (faster)
+    if API_TOKEN_AUTH in tried:
+        api_token_service = api_token_service or get_api_token_service()
+        user_id = api_token_service.verify_token_sync(token)
+        
+        if user_id:
+            identity = {
+                "user_id": user_id,
+                "auth_type": API_TOKEN_AUTH
+            }
+            cache_identity(key, identity)
+            return identity
+    
+    # Try Firebase ID token
+    if FIREBASE_AUTH in tried:
+        firebase_service = firebase_service or get_firebase_service()
+        if firebase_service.is_available():
+            try:
+                decoded_token = firebase_service.verify_id_token_sync(token)
+            except FirebaseError as e:
+                decoded_token = None
+                reason = str(e)
+
+            if decoded_token:
+                identity = {
+                    "user_id": decoded_token["uid"],
+                    "auth_type": FIREBASE_AUTH,
+                    "firebase_token": decoded_token
+                }
+                cache_identity(key, identity)
+                return identity
+    
+    # Only a token rejected by every verifier that could accept it is known bad
+    if tried == candidates:
+        record_failure(key, reason)
+    return None
+
+
+async def resolve_identity_async(
+    token: str,
+    auth_types: Tuple[str, ...] = ALL_AUTH_TYPES,
+    firebase_service: Optional[FirebaseService] = None,
+    api_token_service: Optional[APITokenService] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    resolve_identity for async callers. Cache hits and known failures are
+    resolved inline; a miss verifies against SQLite or Firebase (which may
+    fetch Google's signing keys), so it runs in a worker thread.
+    """
+    key = token_key(token)
+    if get_cached_identity(key) is None and not is_known_failure(key):
+        return await anyio.to_thread.run_sync(
+            resolve_identity, token, auth_types, firebase_service, api_token_service
+        )
+    return resolve_identity(token, auth_types, firebase_service, api_token_service)
+
+
+def _user_id_pair(identity: Optional[Dict[str, Any]]) -> Optional[Tuple[str, str]]:
+    if not identity:
+        return None
+    return identity["auth_type"], identity["user_id"]
+
+
+def resolve_user_id(token: str) -> Optional[Tuple[str, str]]:
+    """Return (auth_type, user_id) for a bearer token, or None if it is invalid."""
+    return _user_id_pair(resolve_identity(token))
+
+
+async def resolve_user_id_async(token: str) -> Optional[Tuple[str, str]]:
+    """Async resolve_user_id; see resolve_identity_async."""
+    return _user_id_pair(await resolve_identity_async(token))
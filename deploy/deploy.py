@@ -5,13 +5,29 @@ Supports multiple deployment targets: local, docker, cloud
 """
 
 import argparse
+import shlex
+import socket
 import subprocess
 import sys
+import tarfile
 import os
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+
+def _port_open(host: str, port: int, timeout: float = 0.1) -> bool:
+    """Return True if a TCP connection to host:port succeeds."""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
 
 
 class DeploymentManager:
@@ -44,22 +60,23 @@ class DeploymentManager:
             "timeout": 120
         }
     
-    def run_command(self, command: str, cwd: Optional[Path] = None) -> subprocess.CompletedProcess:
-        """Run a shell command."""
-        print(f"🔄 Running: {command}")
+    def run_command(self, command: List[str], cwd: Optional[Path] = None) -> subprocess.CompletedProcess:
+        """Run a command directly, without a shell."""
+        command = [str(arg) for arg in command]
+        display = shlex.join(command)
+        print(f"🔄 Running: {display}")
         try:
             result = subprocess.run(
                 command,
-                shell=True,
                 check=True,
                 capture_output=True,
                 text=True,
                 cwd=cwd or self.project_root
             )
-            print(f"✅ Success: {command}")
+            print(f"✅ Success: {display}")
             return result
         except subprocess.CalledProcessError as e:
-            print(f"❌ Failed: {command}")
+            print(f"❌ Failed: {display}")
             print(f"Error: {e.stderr}")
             raise
     
@@ -72,8 +89,8 @@ class DeploymentManager:
         
         for tool in prerequisites:
             try:
-                self.run_command(f"{tool} --version")
-            except subprocess.CalledProcessError:
+                self.run_command([tool, "--version"])
+            except (subprocess.CalledProcessError, FileNotFoundError):
                 missing.append(tool)
         
         if missing:
@@ -87,8 +104,8 @@ class DeploymentManager:
         """Build Docker images."""
         print("🏗️ Building Docker images...")
         
-        cache_flag = "--no-cache" if no_cache else ""
-        self.run_command(f"docker-compose build {cache_flag}")
+        cache_flag = ["--no-cache"] if no_cache else []
+        self.run_command(["docker-compose", "build", *cache_flag])
     
     def deploy_local(self, environment: str = "development") -> None:
         """Deploy locally using Docker Compose."""
@@ -103,10 +120,10 @@ class DeploymentManager:
             print(f"⚠️ Environment file {env_file} not found, using default values")
         
         # Stop existing containers
-        self.run_command(f"docker-compose -f {compose_file} down")
+        self.run_command(["docker-compose", "-f", compose_file, "down"])
         
         # Deploy services
-        self.run_command(f"docker-compose -f {compose_file} up -d")
+        self.run_command(["docker-compose", "-f", compose_file, "up", "-d"])
         
         # Wait for services to be ready
         self.wait_for_health_check()
@@ -131,18 +148,28 @@ class DeploymentManager:
         
         print(f"🏥 Waiting for health check at {health_url}...")
         
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                import requests
-                response = requests.get(health_url, timeout=5)
-                if response.status_code == 200:
-                    print("✅ Health check passed!")
-                    return
-            except Exception as e:
-                pass
-            
-            time.sleep(5)
+        parts = urlsplit(health_url)
+        host = parts.hostname or "localhost"
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        
+        # One keep-alive connection for every probe; poll quickly at first,
+        # backing off to every 5 seconds
+        deadline = time.monotonic() + timeout
+        delay = 0.2
+        with requests.Session() as session:
+            while time.monotonic() < deadline:
+                # Only send the HTTP request once the port accepts connections
+                try:
+                    if _port_open(host, port):
+                        response = session.get(health_url, timeout=5)
+                        if response.status_code == 200:
+                            print("✅ Health check passed!")
+                            return
+                except requests.RequestException:
+                    pass
+                
+                time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+                delay = min(delay * 2, 5.0)
         
         raise Exception(f"Health check failed after {timeout} seconds")
     
@@ -173,7 +200,7 @@ class DeploymentManager:
         print("↩️ Rolling back deployment...")
         
         # Stop current containers
-        self.run_command("docker-compose down")
+        self.run_command(["docker-compose", "down"])
         
         # Restore from backup (if available)
         backup_path = self.project_root / "backups" / "latest"
@@ -190,37 +217,43 @@ class DeploymentManager:
         backup_dir = self.project_root / "backups" / f"backup_{int(time.time())}"
         backup_dir.mkdir(parents=True, exist_ok=True)
         
-        # Backup configuration
-        config_files = [".env", "docker-compose.yml", "config/"]
-        for config_file in config_files:
-            source = self.project_root / config_file
-            if source.exists():
-                if source.is_dir():
-                    self.run_command(f"cp -r {source} {backup_dir}/")
-                else:
-                    self.run_command(f"cp {source} {backup_dir}/")
-        
-        # Backup data volumes
-        self.run_command("docker run --rm -v docling_redis_data:/data -v $(pwd)/backups:/backup busybox tar czf /backup/redis_data.tar.gz -C /data .")
+        # Backup configuration into one archive
+        config_files = [".env", "docker-compose.yml", "config"]
+        with tarfile.open(backup_dir / "config.tar.gz", "w:gz") as archive:
+            for config_file in config_files:
+                source = self.project_root / config_file
+                if source.exists():
+                    archive.add(source, arcname=config_file)
+        
+        # Backup data volumes next to it
+        self.run_command([
+            "docker", "run", "--rm",
+            "-v", "docling_redis_data:/data",
+            "-v", f"{backup_dir}:/backup",
+            "busybox", "tar", "czf", "/backup/redis_data.tar.gz", "-C", "/data", "."
+        ])
         
         print(f"✅ Backup created at {backup_dir}")
     
     def logs(self, service: str = None, follow: bool = False) -> None:
         """Show logs for services."""
-        service_arg = service if service else ""
-        follow_arg = "-f" if follow else ""
+        service_arg = [service] if service else []
+        follow_arg = ["-f"] if follow else []
         
-        self.run_command(f"docker-compose logs {follow_arg} {service_arg}")
+        self.run_command(["docker-compose", "logs", *follow_arg, *service_arg])
     
     def status(self) -> None:
         """Show status of all services."""
-        print("📊 Service Status:")
-        self.run_command("docker-compose ps")
+        # Probe the API while docker-compose reports container status
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            probe = executor.submit(requests.get, self.config["health_check_url"], timeout=5)
+            
+            print("📊 Service Status:")
+            self.run_command(["docker-compose", "ps"])
         
         print("\n🔍 Health Check:")
         try:
-            import requests
-            response = requests.get(self.config["health_check_url"], timeout=5)
+            response = probe.result()
             if response.status_code == 200:
                 health_data = response.json()
                 print(f"✅ API Status: {health_data.get('status', 'unknown')}")
@@ -235,13 +268,13 @@ class DeploymentManager:
         print("🧹 Cleaning up...")
         
         # Remove unused images
-        self.run_command("docker image prune -f")
+        self.run_command(["docker", "image", "prune", "-f"])
         
         # Remove unused volumes
-        self.run_command("docker volume prune -f")
+        self.run_command(["docker", "volume", "prune", "-f"])
         
         # Remove unused networks
-        self.run_command("docker network prune -f")
+        self.run_command(["docker", "network", "prune", "-f"])
         
         print("✅ Cleanup completed")
 
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Backfill weekly and monthly analytics rollups from the daily stats documents.
+
+Dashboard reads use weekly/monthly rollup documents, which are only written
+for events tracked after rollups were introduced. This rebuilds every rollup
+document from the daily documents, which hold the full history. It overwrites
+rather than increments, so it is safe to run again; run it during a quiet
+period, since increments landing mid-run are overwritten until the next run.
+
+It also adds date_epoch_day, the usage-trends range key, to daily documents
+written before that field existed.
+
+Usage (from the project root):
+    python scripts/backfill_analytics_rollups.py [--dry-run]
+"""
+
+import argparse
+import sys
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from firebase_admin import firestore  # noqa: E402
+
+from app.services.analytics_service import (  # noqa: E402
+    API_USAGE_ROLLUPS,
+    DOCUMENT_ROLLUPS,
+    _epoch_day,
+    _month_key,
+    _week_key,
+)
+from app.services.firebase_service import get_firebase_service  # noqa: E402
+
+# Identify a document rather than count anything
+KEY_FIELDS = {'user_id', 'date', 'date_epoch_day', 'period', 'updated_at'}
+# Firestore's WriteBatch limit
+BATCH_SIZE = 500
+
+
+def add_stats(total: Dict[str, Any], stat: Dict[str, Any]) -> None:
+    """Add one daily document's counters into total, including nested maps."""
+    for field, value in stat.items():
+        if field in KEY_FIELDS:
+            continue
+        if isinstance(value, dict):
+            add_stats(total.setdefault(field, {}), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            total[field] = total.get(field, 0) + value
+
+
+def backfill(db, rollups: Tuple[str, str, str], dry_run: bool) -> None:
+    """Rebuild one stats family's weekly and monthly documents."""
+    daily, weekly, monthly = rollups
+    totals: Dict[Tuple[str, str, str], Dict[str, Any]] = defaultdict(dict)
+    # Daily document -> its missing date_epoch_day
+    epoch_days = {}
+
+    days = 0
+    for doc in db.collection(daily).stream():
+        stat = doc.to_dict()
+        day = date.fromisoformat(stat['date'])
+        user_id = stat['user_id']
+        add_stats(totals[(weekly, user_id, _week_key(day))], stat)
+        add_stats(totals[(monthly, user_id, _month_key(day))], stat)
+        if 'date_epoch_day' not in stat:
+            epoch_days[doc.reference] = _epoch_day(day)
+        days += 1
+
+    print(
+        f"{daily}: {days} daily documents -> {len(totals)} rollup documents, "
+        f"{len(epoch_days)} missing date_epoch_day"
+    )
+    if dry_run:
+        return
+
+    # (document, data, merge): rollups are replaced, daily documents only gain the field
+    writes = [
+        (db.collection(collection).document(f"{user_id}_{period}"), {
+            'user_id': user_id,
+            'period': period,
+            **stats,
+            'updated_at': firestore.SERVER_TIMESTAMP
+        }, False)
+        for (collection, user_id, period), stats in totals.items()
+    ] + [
+        (ref, {'date_epoch_day': epoch_day}, True)
+        for ref, epoch_day in epoch_days.items()
+    ]
+
+    batch, pending = db.batch(), 0
+    for ref, data, merge in writes:
+        batch.set(ref, data, merge=merge)
+        pending += 1
+        if pending == BATCH_SIZE:
+            batch.commit()
+            batch, pending = db.batch(), 0
+    if pending:
+        batch.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild analytics rollups from daily stats")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be written")
+    args = parser.parse_args()
+
+    if not get_firebase_service().is_available():
+        print("❌ Firebase is not configured; set the FIREBASE_* settings first")
+        sys.exit(1)
+
+    db = firestore.client()
+    for rollups in (API_USAGE_ROLLUPS, DOCUMENT_ROLLUPS):
+        backfill(db, rollups, args.dry_run)
+    print("✅ Rollups rebuilt" if not args.dry_run else "✅ Dry run complete")
+
+
+if __name__ == "__main__":
+    main()
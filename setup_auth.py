@@ -3,23 +3,88 @@
 Setup script for installing authentication dependencies and initializing the system.
 """
 
-import subprocess
 import sys
+
+# Check Python version before doing any other work
+MIN_PYTHON = (3, 8)
+if sys.version_info < MIN_PYTHON:
+    print("❌ Python 3.8 or higher is required")
+    sys.exit(1)
+
+import argparse
+import hashlib
+import importlib.util
+import secrets
+import subprocess
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+APP_DIR = Path(__file__).resolve().parent / "app"
+
+# Package name -> import name
+DEPENDENCIES = {
+    "firebase-admin": "firebase_admin",
+    "redis": "redis",
+    "python-multipart": "multipart",  # Already in requirements but ensuring it's there
+}
+
+# Written after a successful run; holds a hash of the setup inputs
+STAMP_FILE = ".setup_auth.stamp"
+# Created by INIT_DB_SCRIPT (app.utils.db.DB_PATH, relative to the project root)
+DB_FILE = APP_DIR.parent / "messages.db"
+
+# Options shared by every run_command call. Output streams to the console;
+# only stderr is kept for errors. pip skips its version check and prompts,
+# and takes an older wheel over building a newer sdist.
+RUN_KWARGS = {
+    "check": True,
+    "stderr": subprocess.PIPE,
+    "text": True,
+    "env": {
+        **os.environ,
+        "PIP_DISABLE_PIP_VERSION_CHECK": "1",
+        "PIP_NO_INPUT": "1",
+        "PIP_PREFER_BINARY": "1",
+    },
+}
+
+# Creates the database and API token tables; run from the project root so
+# the app package and its relative imports resolve
+INIT_DB_SCRIPT = (
+    "from app.utils.db import init_db; init_db(); "
+    "from app.services.api_token_service import get_api_token_service; "
+    "get_api_token_service()"
+)
+
+NEXT_STEPS = """
+🎉 Setup Complete!
+====================
+
+Next Steps:
+1. Configure Firebase (if needed):
+   - Create Firebase project at https://console.firebase.google.com
+   - Enable Authentication
+   - Download service account key
+   - Update FIREBASE_* variables in .env
+
+2. Start Redis (if not already running):
+   docker run -d -p 6379:6379 redis:alpine
+
+3. Start the API server:
+   python -m uvicorn main:app --reload --host 0.0.0.0 --port 8000
+
+4. Visit http://localhost:8000/docs to see the API documentation
+
+📚 Read AUTHENTICATION.md for detailed setup instructions"""
+
 
 def run_command(command, description):
-    """Run a command and handle errors."""
-    print(f"🔄 {description}...")
+    """Run a command, given as an argument list, and handle errors."""
+    # Flush so our output lands before the child's on a shared stdout
+    print(f"🔄 {description}...", flush=True)
     try:
-        result = subprocess.run(
-            command, 
-            shell=True, 
-            check=True, 
-            capture_output=True, 
-            text=True
-        )
+        result = subprocess.run(command, **RUN_KWARGS)
         print(f"✅ {description} completed successfully")
         return result
     except subprocess.CalledProcessError as e:
@@ -28,122 +93,167 @@ def run_command(command, description):
         return None
 
 
-def main():
-    """Main setup function."""
-    print("🚀 Setting up Docling NLP API Authentication System")
-    print("=" * 50)
+def setup_key():
+    """Hash the inputs that decide what setup does, to detect a no-op rerun."""
+    digest = hashlib.blake2b(repr(sorted(DEPENDENCIES.items())).encode())
+    for name in ("requirements.txt", ".env.example"):
+        path = Path(name)
+        if path.exists():
+            digest.update(name.encode() + b"\0" + path.read_bytes())
+    return digest.hexdigest()
+
+
+def check_redis():
+    """Test the Redis connection (optional); return (available, report lines)."""
+    lines = ["\n🔗 Testing Redis Connection", "-" * 30]
     
-    # Check Python version
-    if sys.version_info < (3, 8):
-        print("❌ Python 3.8 or higher is required")
-        sys.exit(1)
+    try:
+        import redis
+    except ImportError as e:
+        error = e
+    else:
+        from redis.backoff import NoBackoff
+        from redis.retry import Retry
+        
+        # Short timeouts and no retries so a missing or filtered Redis fails fast
+        r = redis.Redis(
+            host='localhost',
+            port=6379,
+            decode_responses=True,
+            socket_connect_timeout=0.5,
+            socket_timeout=0.5,
+            retry=Retry(NoBackoff(), 0)
+        )
+        try:
+            r.ping()
+            lines.append("✅ Redis is available")
+            return True, lines
+        except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError) as e:
+            error = e
     
-    print(f"✅ Python version: {sys.version}")
+    lines += [
+        f"⚠️  Redis not available: {error}",
+        "   Rate limiting will use in-memory storage",
+        "   For production, install Redis:",
+        "   - Docker: docker run -d -p 6379:6379 redis:alpine",
+        "   - Windows: https://redis.io/download",
+        "   - macOS: brew install redis",
+        "   - Linux: sudo apt-get install redis-server",
+    ]
+    
+    return False, lines
+
+
+def init_database():
+    """Initialize the database and API token tables; return (ok, report lines)."""
+    lines = ["\n🗄️  Initializing Database", "-" * 25]
+    
+    # Runs in a separate interpreter so importing the app (Firebase SDK and
+    # friends) neither slows down nor leaks state into this process
+    result = subprocess.run(
+        [sys.executable, "-c", INIT_DB_SCRIPT],
+        cwd=APP_DIR.parent,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    
+    if result.returncode == 0:
+        lines.append("✅ Database initialized")
+        lines.append("✅ API token service initialized")
+    else:
+        error = result.stderr.strip().splitlines()
+        lines.append(f"⚠️  Database initialization warning: {error[-1] if error else result.returncode}")
+    
+    return result.returncode == 0, lines
+
+
+def main(force=False):
+    """Main setup function."""
+    print(
+        "🚀 Setting up Docling NLP API Authentication System\n"
+        + "=" * 50 + "\n"
+        + f"✅ Python version: {sys.version}"
+    )
     
     # Change to the app directory
-    app_dir = Path(__file__).parent / "app"
-    if not app_dir.exists():
+    try:
+        os.chdir(APP_DIR)
+    except FileNotFoundError:
         print("❌ App directory not found")
         sys.exit(1)
     
-    os.chdir(app_dir)
-    print(f"📂 Working directory: {app_dir}")
+    print(f"📂 Working directory: {APP_DIR}")
     
-    # Install dependencies
-    print("\n📦 Installing Dependencies")
-    print("-" * 30)
-    
-    dependencies = [
-        "firebase-admin",
-        "slowapi",
-        "redis",
-        "python-multipart",  # Already in requirements but ensuring it's there
-    ]
+    env_file = Path(".env")
+    env_example = Path(".env.example")
     
-    for dep in dependencies:
-        run_command(f"pip install {dep}", f"Installing {dep}")
+    # Nothing to do if the last successful run had the same inputs
+    key = setup_key()
+    stamp = Path(STAMP_FILE)
+    configured = env_file.exists() and DB_FILE.exists()
+    if not force and configured and stamp.exists() and stamp.read_text() == key:
+        print("✅ Already configured (use --force to run setup again)")
+        return
     
     # Create .env file if it doesn't exist
-    env_file = Path(".env")
-    env_example = Path(".env.example")
     
     if not env_file.exists() and env_example.exists():
-        print("\n🔧 Setting up environment configuration")
-        print("-" * 40)
+        print("\n🔧 Setting up environment configuration\n" + "-" * 40)
         
-        # Copy example to .env
+        # Generate a random JWT secret key
+        jwt_secret = secrets.token_urlsafe(64)
+        placeholder = 'JWT_SECRET_KEY="your-super-secret-jwt-key-change-in-production"'
+        
+        # Copy example to .env line by line, filling in the secret
         with open(env_example, 'r') as src, open(env_file, 'w') as dst:
-            content = src.read()
-            # Generate a random JWT secret key
-            import secrets
-            jwt_secret = secrets.token_urlsafe(64)
-            content = content.replace(
-                'JWT_SECRET_KEY="your-super-secret-jwt-key-change-in-production"',
-                f'JWT_SECRET_KEY="{jwt_secret}"'
-            )
-            dst.write(content)
+            for line in src:
+                if line.startswith(placeholder):
+                    line = line.replace(placeholder, f'JWT_SECRET_KEY="{jwt_secret}"', 1)
+                dst.write(line)
         
-        print("✅ Created .env file from template")
-        print("⚠️  Please update Firebase configuration in .env file")
+        print(
+            "✅ Created .env file from template\n"
+            "⚠️  Please update Firebase configuration in .env file"
+        )
     elif env_file.exists():
         print("✅ .env file already exists")
     else:
         print("❌ No .env.example file found")
     
-    # Test Redis connection (optional)
-    print("\n🔗 Testing Redis Connection")
-    print("-" * 30)
+    # Install dependencies
+    print("\n📦 Installing Dependencies\n" + "-" * 30)
     
-    try:
-        import redis
-        r = redis.Redis(host='localhost', port=6379, decode_responses=True)
-        r.ping()
-        print("✅ Redis is available")
-    except Exception as e:
-        print(f"⚠️  Redis not available: {e}")
-        print("   Rate limiting will use in-memory storage")
-        print("   For production, install Redis:")
-        print("   - Docker: docker run -d -p 6379:6379 redis:alpine")
-        print("   - Windows: https://redis.io/download")
-        print("   - macOS: brew install redis")
-        print("   - Linux: sudo apt-get install redis-server")
-    
-    # Initialize database
-    print("\n🗄️  Initializing Database")
-    print("-" * 25)
+    missing = [
+        package for package, module in DEPENDENCIES.items()
+        if importlib.util.find_spec(module) is None
+    ]
     
-    try:
-        # Import and run database initialization
-        sys.path.append('.')
-        from utils.db import init_db
-        from services.api_token_service import get_api_token_service
-        
-        init_db()
-        print("✅ Database initialized")
-        
-        # Initialize API token service (creates tables)
-        get_api_token_service()
-        print("✅ API token service initialized")
-        
-    except Exception as e:
-        print(f"⚠️  Database initialization warning: {e}")
+    installed = True
+    if missing:
+        # One pip run, in this interpreter, resolves and installs everything together
+        installed = run_command(
+            [sys.executable, "-m", "pip", "install", *missing],
+            "Installing " + ", ".join(missing)
+        ) is not None
+    else:
+        print("✅ All dependencies already installed")
+    
+    # Redis and the database don't depend on each other; check both at once
+    # and report each as it finishes
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        database = executor.submit(init_database)
+        for future in as_completed([executor.submit(check_redis), database]):
+            print("\n".join(future.result()[1]))
+    
+    # Redis is optional, so its result doesn't block the stamp
+    if installed and database.result()[0] and env_file.exists():
+        stamp.write_text(key)
     
     # Provide next steps
-    print("\n🎉 Setup Complete!")
-    print("=" * 20)
-    print("\nNext Steps:")
-    print("1. Configure Firebase (if needed):")
-    print("   - Create Firebase project at https://console.firebase.google.com")
-    print("   - Enable Authentication")
-    print("   - Download service account key")
-    print("   - Update FIREBASE_* variables in .env")
-    print("\n2. Start Redis (if not already running):")
-    print("   docker run -d -p 6379:6379 redis:alpine")
-    print("\n3. Start the API server:")
-    print("   python -m uvicorn main:app --reload --host 0.0.0.0 --port 8000")
-    print("\n4. Visit http://localhost:8000/docs to see the API documentation")
-    print("\n📚 Read AUTHENTICATION.md for detailed setup instructions")
-
+    print(NEXT_STEPS)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Set up the authentication system")
+    parser.add_argument("--force", action="store_true", help="Run setup even if nothing changed")
+    main(force=parser.parse_args().force)
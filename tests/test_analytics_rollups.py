@@ -0,0 +1,93 @@
+"""Rollup period splitting used by the analytics dashboard reads."""
+
+from datetime import date, timedelta
+
+import pytest
+
+from app.services.analytics_service import (
+    _month_key,
+    _next_month,
+    _rollup_periods,
+    _week_key,
+)
+
+
+def expand(months, weeks, days):
+    """Every day covered by the rollup documents, in order of coverage."""
+    covered = []
+    for month in months:
+        day = month
+        while day < _next_month(month):
+            covered.append(day)
+            day += timedelta(days=1)
+    for week in weeks:
+        covered.extend(week + timedelta(days=offset) for offset in range(7))
+    covered.extend(days)
+    return covered
+
+
+class TestPeriodKeys:
+    def test_week_key_uses_iso_year(self):
+        # 2024-12-30 is the Monday of ISO week 1 of 2025
+        assert _week_key(date(2024, 12, 30)) == "2025_W01"
+        assert _week_key(date(2024, 2, 14)) == "2024_W07"
+
+    def test_month_key(self):
+        assert _month_key(date(2024, 2, 29)) == "2024_02"
+
+    def test_next_month_rolls_over_year(self):
+        assert _next_month(date(2024, 12, 31)) == date(2025, 1, 1)
+        assert _next_month(date(2024, 1, 31)) == date(2024, 2, 1)
+
+
+class TestRollupPeriods:
+    def test_whole_month(self):
+        assert _rollup_periods(date(2024, 2, 1), date(2024, 2, 29)) == (
+            [date(2024, 2, 1)], [], []
+        )
+
+    def test_whole_iso_week(self):
+        # Monday 2024-01-15 to Sunday 2024-01-21
+        assert _rollup_periods(date(2024, 1, 15), date(2024, 1, 21)) == (
+            [], [date(2024, 1, 15)], []
+        )
+
+    def test_short_range_is_days(self):
+        months, weeks, days = _rollup_periods(date(2024, 1, 17), date(2024, 1, 19))
+        assert (months, weeks) == ([], [])
+        assert days == [date(2024, 1, 17), date(2024, 1, 18), date(2024, 1, 19)]
+
+    def test_split_around_a_whole_month(self):
+        months, weeks, days = _rollup_periods(date(2024, 1, 10), date(2024, 3, 5))
+
+        assert months == [date(2024, 2, 1)]
+        assert weeks == [date(2024, 1, 15), date(2024, 1, 22)]
+        assert days == (
+            [date(2024, 1, d) for d in range(10, 15)]
+            + [date(2024, 1, d) for d in range(29, 32)]
+            + [date(2024, 3, d) for d in range(1, 6)]
+        )
+
+    def test_weeks_never_cross_into_a_month_rollup(self):
+        # 2024-01-29 is a Monday whose week ends in February
+        months, weeks, _ = _rollup_periods(date(2024, 1, 29), date(2024, 2, 29))
+        assert months == [date(2024, 2, 1)]
+        assert weeks == []
+
+    def test_single_day(self):
+        assert _rollup_periods(date(2024, 5, 5), date(2024, 5, 5)) == (
+            [], [], [date(2024, 5, 5)]
+        )
+
+    @pytest.mark.parametrize("start, end", [
+        (date(2024, 1, 1), date(2024, 12, 31)),
+        (date(2023, 12, 20), date(2024, 1, 10)),
+        (date(2024, 2, 2), date(2024, 5, 1)),
+        (date(2024, 10, 17), date(2025, 1, 15)),
+        (date(2024, 3, 4), date(2024, 3, 30)),
+    ])
+    def test_covers_every_day_exactly_once(self, start, end):
+        covered = expand(*_rollup_periods(start, end))
+
+        expected = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+        assert sorted(covered) == expected
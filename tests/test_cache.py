@@ -0,0 +1,173 @@
+"""TTLCache and SWRCache tests."""
+
+import asyncio
+
+import pytest
+
+from app.utils import cache
+from app.utils.cache import SWRCache, TTLCache
+
+
+class FakeClock:
+    """Stands in for the time module; advanced by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+class TestTTLCache:
+    def test_returns_value_until_expiry(self, clock):
+        ttl_cache = TTLCache(maxsize=10, ttl=5)
+        ttl_cache.set("k", "v")
+
+        clock.advance(4.9)
+        assert ttl_cache.get("k") == "v"
+        clock.advance(0.1)
+        assert ttl_cache.get("k") is None
+        assert len(ttl_cache) == 0
+
+    def test_missing_key_returns_default(self, clock):
+        assert TTLCache(maxsize=10, ttl=5).get("k", "default") == "default"
+
+    def test_per_entry_ttl(self, clock):
+        ttl_cache = TTLCache(maxsize=10, ttl=60)
+        ttl_cache.set("short", 1, ttl=1)
+        ttl_cache.set("long", 2)
+
+        clock.advance(2)
+        assert ttl_cache.get("short") is None
+        assert ttl_cache.get("long") == 2
+
+    def test_non_positive_ttl_removes_entry(self, clock):
+        ttl_cache = TTLCache(maxsize=10, ttl=60)
+        ttl_cache.set("k", "v")
+        ttl_cache.set("k", "new", ttl=0)
+        assert ttl_cache.get("k") is None
+
+    def test_evicts_least_recently_used(self, clock):
+        ttl_cache = TTLCache(maxsize=2, ttl=60)
+        ttl_cache.set("a", 1)
+        ttl_cache.set("b", 2)
+        ttl_cache.get("a")
+        ttl_cache.set("c", 3)
+
+        assert ttl_cache.get("a") == 1
+        assert ttl_cache.get("b") is None
+        assert ttl_cache.get("c") == 3
+
+    def test_pop_and_discard_where(self, clock):
+        ttl_cache = TTLCache(maxsize=10, ttl=60)
+        for key, owner in (("a", "u1"), ("b", "u2"), ("c", "u1")):
+            ttl_cache.set(key, {"user_id": owner})
+
+        assert ttl_cache.pop("b") == {"user_id": "u2"}
+        assert ttl_cache.pop("b", "gone") == "gone"
+        assert ttl_cache.discard_where(lambda value: value["user_id"] == "u1") == 2
+        assert len(ttl_cache) == 0
+
+
+class TestSWRCache:
+    def test_miss_fetches_once_for_concurrent_callers(self, clock):
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0)
+            return "value"
+
+        async def scenario():
+            swr = SWRCache(maxsize=10, fresh_ttl=10, stale_ttl=60)
+            return await asyncio.gather(*(swr.get_or_fetch("k", fetch) for _ in range(5)))
+
+        assert asyncio.run(scenario()) == ["value"] * 5
+        assert len(calls) == 1
+
+    def test_fresh_value_is_served_without_fetching(self, clock):
+        values = iter(["first", "second"])
+
+        async def fetch():
+            return next(values)
+
+        async def scenario():
+            swr = SWRCache(maxsize=10, fresh_ttl=10, stale_ttl=60)
+            await swr.get_or_fetch("k", fetch)
+            clock.advance(5)
+            return await swr.get_or_fetch("k", fetch)
+
+        assert asyncio.run(scenario()) == "first"
+
+    def test_stale_value_is_served_while_refreshing(self, clock):
+        values = iter(["first", "second"])
+
+        async def fetch():
+            return next(values)
+
+        async def scenario():
+            swr = SWRCache(maxsize=10, fresh_ttl=10, stale_ttl=60)
+            await swr.get_or_fetch("k", fetch)
+            clock.advance(20)
+            stale = await swr.get_or_fetch("k", fetch)
+            # Let the background refresh finish
+            for _ in range(3):
+                await asyncio.sleep(0)
+            return stale, await swr.get_or_fetch("k", fetch)
+
+        assert asyncio.run(scenario()) == ("first", "second")
+
+    def test_expired_value_is_fetched_again(self, clock):
+        values = iter(["first", "second"])
+
+        async def fetch():
+            return next(values)
+
+        async def scenario():
+            swr = SWRCache(maxsize=10, fresh_ttl=10, stale_ttl=60)
+            await swr.get_or_fetch("k", fetch)
+            clock.advance(61)
+            return await swr.get_or_fetch("k", fetch)
+
+        assert asyncio.run(scenario()) == "second"
+
+    def test_failed_refresh_keeps_stale_value(self, clock):
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            if len(calls) > 1:
+                raise RuntimeError("backend down")
+            return "first"
+
+        async def scenario():
+            swr = SWRCache(maxsize=10, fresh_ttl=10, stale_ttl=60)
+            await swr.get_or_fetch("k", fetch)
+            clock.advance(20)
+            await swr.get_or_fetch("k", fetch)
+            for _ in range(3):
+                await asyncio.sleep(0)
+            return await swr.get_or_fetch("k", fetch)
+
+        assert asyncio.run(scenario()) == "first"
+
+    def test_miss_propagates_fetch_error(self, clock):
+        async def fetch():
+            raise RuntimeError("backend down")
+
+        async def scenario():
+            swr = SWRCache(maxsize=10, fresh_ttl=10, stale_ttl=60)
+            await swr.get_or_fetch("k", fetch)
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(scenario())
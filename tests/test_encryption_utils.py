@@ -0,0 +1,92 @@
+"""Message encryption tests: AES-GCM plus legacy AES-CBC decryption."""
+
+import base64
+import os
+
+import pytest
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from app.utils.encryption_utils import (
+    GCM_PREFIX,
+    decrypt_bytes,
+    decrypt_message,
+    derive_key,
+    encrypt_bytes,
+    encrypt_message,
+    generate_salt,
+)
+
+
+def legacy_encrypt(plaintext: str, key: str, salt_b64: str = None) -> str:
+    """Encrypt the way messages were stored before AES-GCM: base64(iv + AES-CBC)."""
+    salt = base64.b64decode(salt_b64) if salt_b64 else None
+    iv = os.urandom(16)
+    padder = padding.PKCS7(128).padder()
+    padded = padder.update(plaintext.encode()) + padder.finalize()
+    encryptor = Cipher(algorithms.AES(derive_key(key.encode(), salt)), modes.CBC(iv)).encryptor()
+    return base64.b64encode(iv + encryptor.update(padded) + encryptor.finalize()).decode()
+
+
+class TestGCM:
+    @pytest.mark.parametrize("salted", [True, False])
+    def test_message_round_trip(self, salted):
+        salt_b64 = generate_salt() if salted else None
+        ciphertext = encrypt_message("hello, world", "passphrase", salt_b64)
+
+        assert ciphertext.startswith(GCM_PREFIX)
+        assert decrypt_message(ciphertext, "passphrase", salt_b64) == "hello, world"
+
+    def test_unicode_and_empty_messages(self):
+        salt_b64 = generate_salt()
+        for message in ("", "héllo ✓ 日本語"):
+            ciphertext = encrypt_message(message, "key", salt_b64)
+            assert decrypt_message(ciphertext, "key", salt_b64) == message
+
+    def test_nonce_is_fresh_per_message(self):
+        salt_b64 = generate_salt()
+        assert encrypt_message("same", "key", salt_b64) != encrypt_message("same", "key", salt_b64)
+
+    def test_tampered_message_is_rejected(self):
+        salt_b64 = generate_salt()
+        ciphertext = encrypt_message("secret", "key", salt_b64)
+        raw = bytearray(base64.b64decode(ciphertext[len(GCM_PREFIX):]))
+        raw[-1] ^= 1
+        tampered = GCM_PREFIX + base64.b64encode(bytes(raw)).decode()
+        with pytest.raises(InvalidTag):
+            decrypt_message(tampered, "key", salt_b64)
+
+    def test_wrong_key_is_rejected(self):
+        salt_b64 = generate_salt()
+        ciphertext = encrypt_message("secret", "right", salt_b64)
+        with pytest.raises(InvalidTag):
+            decrypt_message(ciphertext, "wrong", salt_b64)
+
+    def test_bytes_round_trip(self):
+        data = os.urandom(1000)
+        assert decrypt_bytes(encrypt_bytes(data, b"key", b"salt"), b"key", b"salt") == data
+
+    def test_tampered_bytes_are_rejected(self):
+        raw = bytearray(encrypt_bytes(b"secret", b"key", b"salt-bytes"))
+        raw[-1] ^= 1
+        with pytest.raises(InvalidTag):
+            decrypt_bytes(bytes(raw), b"key", b"salt-bytes")
+
+
+class TestLegacyCBC:
+    def test_decrypts_salted_legacy_message(self):
+        salt_b64 = generate_salt()
+        ciphertext = legacy_encrypt("stored before GCM", "passphrase", salt_b64)
+
+        assert not ciphertext.startswith(GCM_PREFIX)
+        assert decrypt_message(ciphertext, "passphrase", salt_b64) == "stored before GCM"
+
+    def test_decrypts_unsalted_legacy_message(self):
+        ciphertext = legacy_encrypt("no salt", "passphrase")
+        assert decrypt_message(ciphertext, "passphrase") == "no salt"
+
+    def test_block_aligned_plaintext(self):
+        # A full 16-byte block gains a whole block of padding
+        ciphertext = legacy_encrypt("x" * 16, "passphrase")
+        assert decrypt_message(ciphertext, "passphrase") == "x" * 16
@@ -0,0 +1,166 @@
+"""Rate-limit tests."""
+
+import asyncio
+import math
+
+import pytest
+
+from app.middleware import rate_limit
+from app.middleware.rate_limit import (
+    TIER_ANONYMOUS,
+    TIER_API_TOKEN,
+    TIER_AUTHENTICATED,
+    make_rl_key,
+    parse_rate_limit,
+)
+from app.utils import cache
+
+
+@pytest.mark.parametrize(
+    "limit, expected",
+    [
+        ("30/minute", (30, 60)),
+        ("1000/hour", (1000, 3600)),
+        ("10000/day", (10000, 86400)),
+        ("5/second", (5, 1)),
+        ("60/minutes", (60, 60)),
+    ],
+)
+def test_parse_rate_limit(limit, expected):
+    assert parse_rate_limit(limit) == expected
+
+
+def test_parse_rate_limit_rejects_unknown_period():
+    with pytest.raises(KeyError):
+        parse_rate_limit("10/fortnight")
+
+
+def test_rl_key_is_tier_byte_plus_fixed_digest():
+    key = make_rl_key(TIER_API_TOKEN, b"user-1")
+    assert len(key) == 9
+    assert key[0] == TIER_API_TOKEN
+    assert make_rl_key(TIER_API_TOKEN, b"user-1") == key
+
+
+def test_rl_keys_differ_by_tier_and_identity():
+    keys = {
+        make_rl_key(TIER_ANONYMOUS, b"user-1"),
+        make_rl_key(TIER_AUTHENTICATED, b"user-1"),
+        make_rl_key(TIER_API_TOKEN, b"user-1"),
+        make_rl_key(TIER_AUTHENTICATED, b"user-2"),
+    }
+    assert len(keys) == 4
+
+
+class FakeClock:
+    """Stands in for the time module; advanced by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time_ns(self) -> int:
+        return int(self.now * 1e9)
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class FakeTokenBucketScript:
+    """The Redis Lua token bucket, evaluated in Python."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.calls = 0
+
+    async def __call__(self, keys, args):
+        self.calls += 1
+        rate, capacity, now, want = args
+        tokens, ts = self.buckets.get(keys[0], (capacity, now))
+        tokens = min(capacity, tokens + max(0, now - ts) * rate)
+
+        granted = min(want, math.floor(tokens))
+        retry_after = 0
+        if granted >= 1:
+            tokens -= granted
+        else:
+            granted = 0
+            retry_after = math.ceil((1 - tokens) / rate)
+
+        self.buckets[keys[0]] = (tokens, now)
+        return [granted, math.floor(tokens), retry_after]
+
+    def tokens(self, key):
+        return self.buckets[key][0]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def redis_bucket(monkeypatch, clock):
+    script = FakeTokenBucketScript()
+    monkeypatch.setattr(rate_limit, "token_bucket_script", script)
+    monkeypatch.setattr(rate_limit, "redis_available", True)
+    rate_limit._leases.clear()
+    rate_limit._request_counts.clear()
+    yield script
+    rate_limit._leases.clear()
+    rate_limit._request_counts.clear()
+
+
+def consume(amount, period_seconds):
+    return asyncio.run(rate_limit._consume("rl:key", amount / period_seconds, amount))
+
+
+class TestConsume:
+    def test_sparse_requests_take_one_token_each(self, redis_bucket, clock):
+        # 1000/day refills under 0.2 tokens over this sequence
+        for _ in range(5):
+            assert consume(1000, 86400) == (True, 0)
+            clock.advance(3)
+
+        assert 995 <= redis_bucket.tokens("rl:key") < 996
+        assert redis_bucket.calls == 5
+
+    def test_busy_key_is_served_from_leases(self, redis_bucket):
+        for _ in range(50):
+            assert consume(1000, 86400) == (True, 0)
+
+        leased = rate_limit._leases.get("rl:key")
+        unused = leased[0] if leased else 0
+        assert 1000 - redis_bucket.tokens("rl:key") == pytest.approx(50 + unused)
+        assert unused < 50
+        assert redis_bucket.calls < 10
+
+    def test_lease_is_capped_at_a_fraction_of_the_burst(self, redis_bucket):
+        for _ in range(100):
+            consume(100, 60)
+
+        assert rate_limit._leases.get("rl:key")[0] < 100 // rate_limit.RATE_LIMIT_LEASE_FRACTION
+
+    def test_nearly_empty_bucket_takes_one_round_trip(self, redis_bucket):
+        for _ in range(10):
+            assert consume(10, 60)[0]
+        assert 0 <= redis_bucket.tokens("rl:key") < 1
+
+        calls = redis_bucket.calls
+        allowed, retry_after_ms = consume(10, 60)
+        assert not allowed
+        assert 0 < retry_after_ms <= 6000
+        assert redis_bucket.calls == calls + 1
+
+    def test_grants_what_is_left_when_short_of_a_lease(self, redis_bucket):
+        redis_bucket.buckets["rl:key"] = (2.0, 1000 * 1000)
+        rate_limit._request_counts.set("rl:key", [50])
+
+        assert consume(1000, 86400) == (True, 0)
+        assert rate_limit._leases.get("rl:key") == [1]
+        assert redis_bucket.calls == 1
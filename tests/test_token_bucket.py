@@ -0,0 +1,82 @@
+"""Token-bucket rate limiter tests."""
+
+import pytest
+
+from app.middleware import token_bucket
+
+
+class FakeClock:
+    """Stands in for the time module; advanced by hand."""
+
+    def __init__(self):
+        self.now_ns = 1_000_000_000
+
+    def monotonic_ns(self) -> int:
+        return self.now_ns
+
+    def advance(self, seconds: float) -> None:
+        self.now_ns += int(seconds * 1e9)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(token_bucket, "time", clock)
+    monkeypatch.setattr(token_bucket, "_buckets", {})
+    monkeypatch.setattr(token_bucket, "_last_sweep_ns", clock.now_ns)
+    return clock
+
+
+class TestTryConsume:
+    def test_allows_burst_then_rejects(self, clock):
+        results = [token_bucket.try_consume("k", rate_per_sec=1, burst=3) for _ in range(4)]
+        assert results == [True, True, True, False]
+
+    def test_refills_at_rate(self, clock):
+        for _ in range(3):
+            token_bucket.try_consume("k", rate_per_sec=2, burst=3)
+        assert not token_bucket.try_consume("k", rate_per_sec=2, burst=3)
+
+        clock.advance(0.5)  # one token at 2/s
+        assert token_bucket.try_consume("k", rate_per_sec=2, burst=3)
+        assert not token_bucket.try_consume("k", rate_per_sec=2, burst=3)
+
+    def test_partial_refill_is_not_enough(self, clock):
+        for _ in range(2):
+            token_bucket.try_consume("k", rate_per_sec=1, burst=2)
+
+        clock.advance(0.9)
+        assert not token_bucket.try_consume("k", rate_per_sec=1, burst=2)
+        clock.advance(0.1)
+        assert token_bucket.try_consume("k", rate_per_sec=1, burst=2)
+
+    def test_refill_is_capped_at_burst(self, clock):
+        token_bucket.try_consume("k", rate_per_sec=10, burst=3)
+        clock.advance(60)
+
+        results = [token_bucket.try_consume("k", rate_per_sec=10, burst=3) for _ in range(4)]
+        assert results == [True, True, True, False]
+
+    def test_keys_have_separate_buckets(self, clock):
+        assert token_bucket.try_consume("a", rate_per_sec=1, burst=1)
+        assert not token_bucket.try_consume("a", rate_per_sec=1, burst=1)
+        assert token_bucket.try_consume("b", rate_per_sec=1, burst=1)
+
+
+class TestSweep:
+    def test_evicts_refilled_buckets(self, clock):
+        token_bucket.try_consume("idle", rate_per_sec=1, burst=5)
+        clock.advance(61)
+        token_bucket.try_consume("active", rate_per_sec=1, burst=5)
+
+        assert "idle" not in token_bucket._buckets
+        assert "active" in token_bucket._buckets
+
+    def test_keeps_buckets_still_refilling(self, clock):
+        for _ in range(5):
+            token_bucket.try_consume("busy", rate_per_sec=0.01, burst=5)
+        clock.advance(61)
+        token_bucket.try_consume("other", rate_per_sec=1, burst=5)
+
+        assert "busy" in token_bucket._buckets
+        assert not token_bucket.try_consume("busy", rate_per_sec=0.01, burst=5)